@@ -0,0 +1 @@
+# keeps the repo root on sys.path, so tests import viralscope without installing it
@@ -0,0 +1,60 @@
+"""The on-disk response cache across scans started at different times."""
+from datetime import datetime, timedelta
+import os
+import time
+
+import pytest
+
+from viralscope import api, db
+from viralscope.engine import ScanConfig, run_scan
+from viralscope.fakeapi import running_server
+
+NOW = datetime(2026, 1, 15, 12, 0, 5, 317867)
+
+@pytest.fixture(scope="module")
+def fake_api():
+    with running_server(n_videos=300, now=NOW) as url:
+        yield url
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch, fake_api):
+    # http_cache/ and fixtures/ are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "viral_scope.db"))
+    monkeypatch.setattr(api, "API_BASE", fake_api)
+    return tmp_path
+
+def scan(cache_mode, now):
+    config = ScanConfig(keywords=["wedding drama", "office revenge"], results_per_keyword=60, requests_per_second=0,
+                        api_keys=["test"], daily_quota_budget=None, save_csv=False, save_to_db=False, cache_mode=cache_mode)
+    return run_scan(config, now=now)
+
+def video_ids(result):
+    return sorted(row.video_id for row in result.db_rows)
+
+def test_replay_serves_a_recording_made_at_another_time(workdir):
+    recorded = scan("record", NOW)
+    assert not recorded.errors and recorded.stats["calls"] > 0
+    for later in (timedelta(minutes=7), timedelta(days=3, hours=5)):
+        replayed = scan("replay", NOW + later)
+        assert not replayed.errors
+        assert replayed.stats["calls"] == 0
+        assert video_ids(replayed) == video_ids(recorded)
+
+def test_cache_is_shared_by_back_to_back_scans(workdir):
+    first = scan("cache", NOW)
+    second = scan("cache", NOW + timedelta(minutes=20))
+    assert first.stats["quota"]["by_stage"].get("search", 0) > 0
+    assert second.stats["quota"]["by_stage"].get("search", 0) == 0
+    assert second.stats["api"]["search"]["cache_hits"] == first.stats["api"]["search"]["calls"]
+    assert video_ids(second) == video_ids(first)
+
+def test_old_cache_entries_are_evicted(workdir):
+    scan("cache", NOW)
+    cache_dir = workdir / api.HTTP_CACHE_DIR
+    names = os.listdir(cache_dir)
+    stale = time.time() - api.CACHE_MAX_AGE_SECONDS - 60
+    for name in names[:5]:
+        os.utime(cache_dir / name, (stale, stale))
+    api.ResponseCache(str(cache_dir), max_age=api.CACHE_MAX_AGE_SECONDS)
+    assert sorted(os.listdir(cache_dir)) == sorted(names[5:])
@@ -0,0 +1,119 @@
+"""Upgrading a pre-versioning database (user_version 0) in place."""
+from datetime import datetime
+import sqlite3
+
+from viralscope import db
+from viralscope.utils import video_key
+
+LEGACY_SCHEMA = """
+    CREATE TABLE runs (run_id TEXT PRIMARY KEY, started_at TEXT, days INTEGER, keywords TEXT, notes TEXT);
+    CREATE TABLE video_samples (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT, keyword TEXT, title TEXT, channel_id TEXT,
+        channel_title TEXT, channel_subs INTEGER, views INTEGER, likes INTEGER, comments INTEGER,
+        duration_seconds INTEGER, thumbnail TEXT, published_at TEXT, virality INTEGER,
+        monetization_likelihood INTEGER, saved_at TEXT
+    );
+"""
+SAMPLE_COLUMNS = ("run_id", "keyword", "title", "channel_id", "channel_title", "channel_subs", "views", "likes", "comments",
+                  "duration_seconds", "thumbnail", "published_at", "virality", "monetization_likelihood", "saved_at")
+LEGACY_ROWS = [
+    ("r1", "aita", "My sister's wedding", "UCa", "Story Time", 1200, 5000, 200, 30, 620, "https://i.ytimg.com/vi/x1/mqdefault.jpg",
+     "2025-03-01T10:00:00", 61, 38, "2025-03-02T09:00:00"),
+    ("r1", "aita", "Revenge on my landlord", "UCa", "Story Time", 1200, 800, 40, 2, 45, None,
+     "2025-03-01T18:30:00", 44, 38, "2025-03-02T09:00:00"),
+    ("r1", "aita,revenge", "Revenge on my landlord", "UCb", "Karma Corner", None, 90, 1, 0, 300, None,
+     "2025-02-27T08:00:00", 20, 13, "2025-03-02T09:00:00"),
+    # the same videos seen again by a later run, and a channel renamed in between
+    ("r2", "aita", "My sister's wedding", "UCa", "Story Time Daily", 1500, 9000, 350, 41, 620,
+     "https://i.ytimg.com/vi/x1/mqdefault.jpg", "2025-03-01T10:00:00", 63, 38, "2025-03-03T09:00:00"),
+    ("r2", "aita,revenge", "Revenge on my landlord", "UCb", "Karma Corner", 10, 95, 1, 0, 300, None,
+     "2025-02-27T08:00:00", 19, 13, "2025-03-03T09:00:00"),
+    ("r2", "update", "Final update (no date)", "UCb", "Karma Corner", 10, 0, 0, 0, 0, None, None, 0, 13, "2025-03-03T09:00:00"),
+]
+
+def legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("INSERT INTO runs VALUES (?,?,?,?,?)",
+                     [("r1", "2025-03-02T09:00:00", 7, "aita,revenge", ""), ("r2", "2025-03-03T09:00:00", 7, "aita,revenge,update", "")])
+    conn.executemany(f"INSERT INTO video_samples({', '.join(SAMPLE_COLUMNS)}) VALUES ({', '.join('?' * len(SAMPLE_COLUMNS))})",
+                     LEGACY_ROWS)
+    conn.commit()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+
+def test_legacy_video_samples_survive_upgrade(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    legacy_db(path)
+    monkeypatch.setattr(db, "DB_FILE", path)
+    db.init_db()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+    assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'video_samples'").fetchone()[0] == "view"
+    rows = conn.execute(f"SELECT {', '.join(SAMPLE_COLUMNS)} FROM video_samples ORDER BY id").fetchall()
+    # channel titles are stored once per channel now, so every row reads the newest one
+    newest_title = {"UCa": "Story Time Daily", "UCb": "Karma Corner"}
+    title_at = SAMPLE_COLUMNS.index("channel_title")
+    assert rows == [row[:title_at] + (newest_title[row[3]],) + row[title_at + 1:] for row in LEGACY_ROWS]
+    # a video seen by both runs is one videos row with two observations
+    assert conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] == 4
+    assert conn.execute("SELECT COUNT(*) FROM video_observations").fetchone()[0] == len(LEGACY_ROWS)
+    assert conn.execute("SELECT channel_id, run_id, sample_count FROM channel_run_rollups ORDER BY 1, 2").fetchall() == [
+        ("UCa", "r1", 2), ("UCa", "r2", 1), ("UCb", "r1", 1), ("UCb", "r2", 2)]
+    conn.close()
+
+    # a second pass over an upgraded database changes nothing
+    db.init_db()
+    conn = sqlite3.connect(path)
+    assert conn.execute(f"SELECT {', '.join(SAMPLE_COLUMNS)} FROM video_samples ORDER BY id").fetchall() == rows
+    conn.close()
+
+def upgraded_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    legacy_db(path)
+    monkeypatch.setattr(db, "DB_FILE", path)
+    db.init_db()
+    return path
+
+def rescanned(title, channel_id, published_at, vid):
+    return {"video_key": video_key(vid), "channel_id": channel_id, "channel_title": "Story Time Daily", "title": title,
+            "published_at": published_at, "keyword": "aita", "views": 12000, "virality": 65, "duration_seconds": 620}
+
+def test_legacy_video_takes_its_id_key_when_seen_again(tmp_path, monkeypatch):
+    path = upgraded_db(tmp_path, monkeypatch)
+    db.save_run_to_db("r3", datetime(2025, 3, 4, 9), 7, ["aita"], "",
+                      [rescanned("My sister's wedding", "UCa", "2025-03-01T10:00:00", "x1")])
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] == 4
+    assert conn.execute("SELECT COUNT(*) FROM video_search").fetchone()[0] == 4
+    assert conn.execute("SELECT COUNT(*), MIN(saved_at) FROM video_observations WHERE video_key = ?",
+                        (video_key("x1"),)).fetchone() == (3, "2025-03-02T09:00:00")
+    assert conn.execute("SELECT COUNT(*) FROM legacy_videos").fetchone()[0] == 3
+    conn.close()
+
+def test_videos_stored_twice_before_the_fix_are_merged(tmp_path, monkeypatch):
+    path = upgraded_db(tmp_path, monkeypatch)
+    conn = sqlite3.connect(path)
+    # what save_run_to_db stored before it knew about legacy keys: a second row for the video
+    legacy = conn.execute("SELECT video_key FROM videos WHERE title = 'My sister''s wedding'").fetchone()[0]
+    conn.execute("DELETE FROM legacy_videos")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(db, "legacy_video_pairs", lambda cur, rows: [])
+    db.save_run_to_db("r3", datetime(2025, 3, 4, 9), 7, ["aita"], "",
+                      [rescanned("My sister's wedding", "UCa", "2025-03-01T10:00:00", "x1")])
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] == 5
+    conn.execute("PRAGMA user_version = 15")
+    conn.commit()
+    conn.close()
+
+    db.init_db()
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM videos WHERE video_key = ?", (legacy,)).fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] == 4
+    assert conn.execute("SELECT COUNT(*) FROM video_search").fetchone()[0] == 4
+    assert conn.execute("SELECT COUNT(*) FROM video_observations WHERE video_key = ?", (video_key("x1"),)).fetchone()[0] == 3
+    assert conn.execute("SELECT first_seen_at FROM videos WHERE video_key = ?", (video_key("x1"),)).fetchone()[0] == "2025-03-02T09:00:00"
+    conn.close()
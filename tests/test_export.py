@@ -0,0 +1,18 @@
+"""Run exports hold what the run observed, like the DB run they share an id with."""
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from viralscope.export import DatasetExport, open_dataset
+
+def row(video_key, **extra):
+    return dict({"video_key": video_key, "keyword": "aita", "title": "t", "views": 10, "virality": 40,
+                 "published_at": "2026-01-14T10:00:00"}, **extra)
+
+def test_history_rows_are_not_exported(tmp_path):
+    export = DatasetExport(str(tmp_path), "parquet", "run1", datetime(2026, 1, 15, 12))
+    export.write([row("new"), row("old", from_history=True)])
+    export.close()
+    assert open_dataset(str(tmp_path)).to_table().column("video_key").to_pylist() == ["new"]
@@ -0,0 +1,83 @@
+"""The batch scoring path must agree with the scalar functions in utils, odd inputs included."""
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from viralscope import scoring
+from viralscope.utils import (
+    compute_virality_score, monetization_likelihood, parse_iso8601_duration_to_seconds, parse_rfc3339_to_datetime,
+    safe_int,
+)
+
+NOW = datetime(2026, 1, 15, 12)
+
+COUNTERS = ["12345", "0", " 7 ", "+3", "-4", "007", "1e3", "abc", "", None, 12, 3.7]
+DURATIONS = ["PT1H2M3S", "PT45S", "PT10M", "PT", "PT1.5S", "PT1.5M2S", "P1D", "1H", "", None]
+TIMESTAMPS = ["2026-01-14T10:00:00Z", "2026-01-10T08:30:00.123456Z", "2026-01-02", "2026-01-14T10:00:00+05:00",
+              "2026-02-01T00:00:00Z", "garbage", "", None]
+# views per day of 9, 99 and 999 score exactly 30, 60 and 90, where log10 may round either way
+VIEWS = ["0", "9", "99", "999", "123456789", "abc", None]
+
+def video_items():
+    items = []
+    for i in range(max(len(COUNTERS), len(DURATIONS), len(TIMESTAMPS), len(VIEWS)) * 3):
+        items.append({
+            "snippet": {"publishedAt": TIMESTAMPS[i % len(TIMESTAMPS)]},
+            "statistics": {"viewCount": VIEWS[i % len(VIEWS)], "likeCount": COUNTERS[i % len(COUNTERS)],
+                           "commentCount": COUNTERS[(i + 5) % len(COUNTERS)]},
+            "contentDetails": {"duration": DURATIONS[i % len(DURATIONS)]},
+        })
+    items.append({})  # no snippet, statistics or contentDetails at all
+    return items
+
+def scalar_row(vi):
+    # the per-item path of engine.merge_video_items
+    publish_dt = parse_rfc3339_to_datetime(vi.get("snippet", {}).get("publishedAt"))
+    stats = vi.get("statistics", {})
+    views = safe_int(stats.get("viewCount", 0))
+    return {
+        "views": views,
+        "likes": safe_int(stats.get("likeCount", 0)),
+        "comments": safe_int(stats.get("commentCount", 0)),
+        "duration_seconds": parse_iso8601_duration_to_seconds(vi.get("contentDetails", {}).get("duration", "PT0S")),
+        "virality": compute_virality_score(views, publish_dt, now=NOW),
+        "published_at": publish_dt.isoformat() if publish_dt else None,
+    }
+
+def test_video_frame_matches_scalar():
+    items = video_items()
+    frame = scoring.video_frame(items, NOW)
+    for vi, row in zip(items, frame.to_dict("records")):
+        assert row == scalar_row(vi), vi
+
+def test_monetization_scores_match_scalar():
+    subs = [None, 0, 499, 500, 999, 1000, 4999, 5000, 9999, 10000, 2500000, 750.5]
+    avg_views = [None, 0, 499.99, 500, 1999, 2000, 9999.5, 10000, 49999, 50000, 3, 1e9]
+    ages = [None, 0, 5, 6, 11, 12, 35, 36, 400]
+    cases = [(s, v, a) for s in subs for v in avg_views for a in ages]
+    batch = scoring.monetization_scores(*zip(*cases)).tolist()
+    assert batch == [monetization_likelihood(s, v, a) for s, v, a in cases]
+
+def test_channel_aggregates_match_scalar():
+    virality = [[50], [10, 80], [30, 30, 20, 90], [5, 5, 5], [70, 10, 40, 40, 99, 0]]
+    channel_map = {"UCempty": {"sample_videos": []}}
+    for c, scores in enumerate(virality):
+        channel_map[f"UC{c}"] = {"sample_videos": [{"duration_seconds": 17 * (i + c) + 1, "views": 1000 * i + c + 7, "virality": v}
+                                                   for i, v in enumerate(scores)]}
+    aggregates = scoring.channel_aggregates(channel_map)
+    assert "UCempty" not in aggregates
+    for cid, cinfo in channel_map.items():
+        sv = cinfo["sample_videos"]
+        if not sv:
+            continue
+        # the hand-rolled path of engine.build_channel_cards
+        virality_list = [v["virality"] for v in sv]
+        assert aggregates[cid] == {
+            "sample_count": len(sv),
+            "avg_duration": sum(v["duration_seconds"] for v in sv) / len(sv),
+            "avg_views_sample": sum(v["views"] for v in sv) / len(sv),
+            "highest_virality": max(virality_list),
+            "median_virality": int(sorted(virality_list)[len(virality_list) // 2]),
+        }
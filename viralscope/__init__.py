@@ -0,0 +1,11 @@
+# viralscope/__init__.py
+"""ViralScope scan engine, importable without Streamlit.
+
+    from viralscope import ScanConfig, run_scan
+    result = run_scan(ScanConfig(keywords=["reddit cheating"], days=7))
+"""
+__version__ = "0.1.0"
+
+from .engine import ScanConfig, ScanResult, VideoRow, run_scan
+
+__all__ = ["ScanConfig", "ScanResult", "VideoRow", "run_scan", "__version__"]
@@ -0,0 +1,154 @@
+# viralscope/bench.py
+"""Offline benchmarks: full scans against the fakeapi stand-in at growing sizes.
+
+Each scale runs the whole pipeline (fetch, scoring, channel cards, save_run_to_db)
+on a throwaway database, then the dashboard's reads. It reports rows per second
+and peak traced memory per stage. Results are saved as JSON, and a later run
+compared against one of those files flags the stages that got slower or bigger.
+"""
+from datetime import datetime
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+from . import __version__, api, db
+from .api import MAX_RESULTS_PER_KEYWORD
+from .engine import ScanConfig, run_scan
+from .fakeapi import running_server
+from .metrics import StageTimer, code_revision
+
+DEFAULT_SCALES = (10, 100, 1000, 10000, 100000)
+REGRESSION_TOLERANCE = 0.25
+MIN_COMPARABLE_SECONDS = 0.05  # shorter stages are mostly timer noise
+MIN_COMPARABLE_PEAK_BYTES = 1 << 20
+BENCH_NOW = datetime(2026, 1, 15, 12)  # fixed, so every run scores the same synthetic videos
+
+def bench_config(n_videos, concurrency):
+    # n_videos distinct videos: full-depth keywords, each served its own block by the fake API
+    depth = min(n_videos, MAX_RESULTS_PER_KEYWORD)
+    return ScanConfig(
+        keywords=[f"bench topic {i}" for i in range(math.ceil(n_videos / depth))],
+        results_per_keyword=depth, concurrency=concurrency, requests_per_second=0, api_keys=["bench"],
+        daily_quota_budget=None, subs_ttl_hours=0, save_csv=False, save_to_db=True,
+    )
+
+def dashboard_queries(timer):
+    # what one dashboard load reads: quota left, runs table, channel picker, a few channels' trends
+    # and samples, and a topic search
+    with timer.stage("dashboard"):
+        db.load_quota_spent_today(BENCH_NOW)
+        rows = len(db.load_runs_summary())
+        channels = db.load_trend_channels()
+        rows += len(channels)
+        for channel_id, _ in channels[:5]:
+            rows += len(db.load_channel_trend(channel_id)) + len(db.load_samples_for_channel(channel_id))
+        rows += len(db.search_topic_history("wedding drama")) + len(db.search_topic_channels("wedding drama"))
+    timer.add("dashboard", rows=rows)
+
+def scan_pass(n_videos, concurrency, trace_memory):
+    # one scan plus the dashboard reads on a fresh database; returns (timer, result)
+    previous = db.DB_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        db.set_db_file(os.path.join(tmp, "bench.db"))
+        timer = StageTimer(trace_memory=trace_memory)
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            result = run_scan(bench_config(n_videos, concurrency), now=BENCH_NOW, timer=timer)
+            dashboard_queries(timer)
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            db.set_db_file(previous)
+    return timer, result
+
+def bench_scale(n_videos, latency_ms=0, concurrency=8, memory=True):
+    # timings come from an untraced pass; tracemalloc slows allocation-heavy stages
+    # several times over, so peak memory gets a pass of its own
+    with running_server(n_videos=n_videos, latency_ms=latency_ms, now=BENCH_NOW) as url:
+        base = api.API_BASE
+        api.set_api_base(url)
+        try:
+            started = time.perf_counter()
+            timer, result = scan_pass(n_videos, concurrency, trace_memory=False)
+            wall = time.perf_counter() - started
+            traced = scan_pass(n_videos, concurrency, trace_memory=True)[0] if memory else None
+        finally:
+            api.set_api_base(base)
+    if result.errors:
+        raise RuntimeError(f"benchmark scan of {n_videos} videos failed: {result.errors[0]}")
+    traced_stages = traced.snapshot() if traced else {}
+    stages = {}
+    for name, v in timer.snapshot().items():
+        stages[name] = {"seconds": v["seconds"], "rows": v["rows"],
+                        "rows_per_second": round(v["rows"] / v["seconds"], 1) if v["seconds"] else None}
+        if name in traced_stages:
+            stages[name]["peak_bytes"] = traced_stages[name].get("peak_bytes")
+    return {
+        "videos": len(result.db_rows),
+        "channels": len(result.channel_cards),
+        "wall_seconds": round(wall, 4),
+        "peak_bytes": traced.peak_bytes if traced else None,
+        "stages": stages,
+        "api": result.metrics.get("api_totals", {}),
+    }
+
+def run_benchmarks(scales=DEFAULT_SCALES, latency_ms=0, concurrency=8, memory=True, on_scale=None):
+    results = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "version": __version__,
+        "revision": code_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {"latency_ms": latency_ms, "concurrency": concurrency},
+        "scales": {},
+    }
+    for n in scales:
+        results["scales"][str(n)] = bench_scale(n, latency_ms=latency_ms, concurrency=concurrency, memory=memory)
+        if on_scale:
+            on_scale(n, results["scales"][str(n)])
+    return results
+
+# -------------------------
+# Baselines
+# -------------------------
+def compare_results(baseline, current, tolerance=REGRESSION_TOLERANCE):
+    # one message per stage that lost more than `tolerance` of its throughput or grew its
+    # peak memory by more than that, for scales present in both runs
+    regressions = []
+    for scale, cur in current["scales"].items():
+        base = baseline.get("scales", {}).get(scale)
+        if not base:
+            continue
+        for name, stage in cur["stages"].items():
+            old = base["stages"].get(name)
+            if not old:
+                continue
+            if old["seconds"] >= MIN_COMPARABLE_SECONDS and old.get("rows_per_second") and stage.get("rows_per_second") is not None \
+                    and stage["rows_per_second"] < old["rows_per_second"] * (1 - tolerance):
+                regressions.append(f"{scale} videos, {name}: {old['rows_per_second']:.0f} -> {stage['rows_per_second']:.0f} rows/s")
+            old_peak, peak = old.get("peak_bytes"), stage.get("peak_bytes")
+            if old_peak and peak and peak >= MIN_COMPARABLE_PEAK_BYTES and peak > old_peak * (1 + tolerance):
+                regressions.append(f"{scale} videos, {name}: peak memory {old_peak / 1e6:.1f} -> {peak / 1e6:.1f} MB")
+    return regressions
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_results(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+def format_scale(n, scale):
+    lines = [f"{n} videos ({scale['channels']} channels): {scale['wall_seconds']:.2f}s"
+             + (f", peak {scale['peak_bytes'] / 1e6:.1f} MB" if scale["peak_bytes"] else "")]
+    for name, stage in scale["stages"].items():
+        rate = f"{stage['rows_per_second']:>12,.0f} rows/s" if stage["rows_per_second"] else f"{'':>19}"
+        peak = f"{stage['peak_bytes'] / 1e6:>8.1f} MB" if stage.get("peak_bytes") is not None else ""
+        lines.append(f"  {name:<10} {stage['rows']:>8} rows {stage['seconds']:>9.3f}s {rate} {peak}")
+    return "\n".join(lines)
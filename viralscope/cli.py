@@ -0,0 +1,282 @@
+# viralscope/cli.py
+"""Command-line entry point: python -m viralscope scan -k "keyword" ..."""
+import argparse
+import json
+import os
+import re
+import sys
+
+from . import db, jobs
+from .api import CACHE_MODES, DEFAULT_DAILY_QUOTA, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_SCAN_CONCURRENCY, MAX_RESULTS_PER_KEYWORD
+from .engine import ScanConfig, run_scan
+from .export import COLUMNAR_FORMATS, EXPORT_DIR
+
+def read_keywords(args):
+    keywords = list(args.keyword or [])
+    if args.keywords_file:
+        with open(args.keywords_file, encoding="utf-8") as f:
+            keywords.extend(k.strip() for k in re.split(r"[\n,]+", f.read()) if k.strip())
+    return list(dict.fromkeys(keywords))
+
+def add_scan_arguments(p):
+    p.add_argument("-k", "--keyword", action="append", help="keyword to search (repeatable)")
+    p.add_argument("--keywords-file", help="file with keywords, one per line")
+    p.add_argument("--days", type=int, default=7, help="search last N days")
+    p.add_argument("--results", type=int, default=8, help=f"results per keyword (max {MAX_RESULTS_PER_KEYWORD})")
+    p.add_argument("--min-subs", type=int, default=0, help="min channel subscribers")
+    p.add_argument("--max-age-months", type=int, default=0, help="only channels created in the last X months")
+    p.add_argument("--exclude-unknown-age", action="store_true", help="drop channels with unknown creation date")
+    p.add_argument("--shorts", action="store_true", help="only channels whose sample avg duration < 60s")
+    p.add_argument("--country", default="", help="channel country filter")
+    p.add_argument("--concurrency", type=int, default=DEFAULT_SCAN_CONCURRENCY)
+    p.add_argument("--rps", type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="max API requests per second (0 = unlimited)")
+    p.add_argument("--subs-ttl-hours", type=int, default=db.CHANNEL_SUBS_TTL_HOURS)
+    p.add_argument("--stop-below-views", type=int, default=0)
+    p.add_argument("--stop-below-virality", type=int, default=0)
+    p.add_argument("--quota-budget", type=int, default=DEFAULT_DAILY_QUOTA, help="daily quota budget in units")
+    p.add_argument("--no-fit-budget", action="store_true", help="do not shrink the scan to the remaining quota")
+    p.add_argument("--cache", choices=CACHE_MODES, default="cache", help="HTTP response cache mode; cache keeps raw responses (video ids included) in http_cache/ for 24 h")
+    p.add_argument("--incremental", action="store_true", help="search only since each keyword's last saved run")
+    p.add_argument("--notes", default="")
+    p.add_argument("--no-csv", action="store_true")
+    p.add_argument("--csv-dir", default=".")
+    p.add_argument("--export", choices=COLUMNAR_FORMATS, help="also write a Parquet / Arrow dataset partitioned by run date and keyword")
+    p.add_argument("--export-dir", default=EXPORT_DIR)
+    p.add_argument("--no-db", action="store_true")
+    p.add_argument("--metrics-log", help="append the run's stage timings and API counters to this JSON-lines file")
+
+def config_from_args(args):
+    return ScanConfig(
+        keywords=read_keywords(args),
+        days=args.days,
+        results_per_keyword=max(1, min(args.results, MAX_RESULTS_PER_KEYWORD)),
+        min_channel_subs=args.min_subs,
+        max_channel_age_months=args.max_age_months,
+        include_unknown_channel_age=not args.exclude_unknown_age,
+        only_shorts=args.shorts,
+        country_filter=args.country,
+        concurrency=args.concurrency,
+        requests_per_second=args.rps,
+        subs_ttl_hours=args.subs_ttl_hours,
+        stop_below_views=args.stop_below_views,
+        stop_below_virality=args.stop_below_virality,
+        daily_quota_budget=args.quota_budget,
+        fit_to_budget=not args.no_fit_budget,
+        cache_mode=args.cache,
+        incremental=args.incremental,
+        notes=args.notes,
+        save_csv=not args.no_csv,
+        csv_dir=args.csv_dir,
+        export_format=args.export,
+        export_dir=args.export_dir,
+        save_to_db=not args.no_db,
+        metrics_log=args.metrics_log,
+    )
+
+def print_progress(done, total, label):
+    print(f"[{done}/{total}] {label}", file=sys.stderr)
+
+def cmd_scan(args):
+    try:
+        config = config_from_args(args)
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return 2
+    if not config.keywords:
+        print("Add at least one keyword (-k or --keywords-file).", file=sys.stderr)
+        return 2
+    if args.background:
+        print(jobs.submit_job(config))
+        return 0
+    result = run_scan(config, on_progress=None if args.quiet else print_progress)
+    for msg in result.notices + result.errors:
+        print(msg, file=sys.stderr)
+    if args.json:
+        cards = [{k: v for k, v in c.items() if k != "sample_videos"} for c in result.channel_cards]
+        json.dump({"run_id": result.run_id, "csv_file": result.csv_file, "export_files": result.export_files, "stats": result.stats,
+                   "metrics": result.metrics, "channels": cards},
+                  sys.stdout, default=str, indent=2)
+        print()
+    else:
+        for c in result.channel_cards:
+            print(f"{c['highest_virality']:>3}  {c['median_virality']:>3}  {c['monetization_likelihood']:>3}%  "
+                  f"{c['subs']:>10}  {c['channel_title']}")
+        print(f"{len(result.channel_cards)} channels, {len(result.db_rows)} videos, "
+              f"{result.stats.get('quota', {}).get('total', 0)} quota units in {result.metrics.get('wall_seconds', 0):.1f}s",
+              file=sys.stderr)
+        if result.csv_file:
+            print(f"CSV saved: {result.csv_file}", file=sys.stderr)
+        if result.export_files:
+            print(f"Exported {len(result.export_files)} {args.export} files to {args.export_dir}", file=sys.stderr)
+        if result.run_id:
+            print(f"Run saved: {result.run_id}", file=sys.stderr)
+    return 1 if result.errors and not result.channel_cards else 0
+
+def cmd_migrate(args):
+    before = db.schema_version()
+    db.init_db()
+    print(f"Schema version {before} -> {db.schema_version()}", file=sys.stderr)
+    if args.vacuum:
+        db.vacuum_db()
+        print("Database compacted", file=sys.stderr)
+    return 0
+
+def cmd_rebuild_rollups(args):
+    db.ensure_db()
+    print(f"Rebuilt {db.rebuild_channel_rollups()} channel trend rows", file=sys.stderr)
+    return 0
+
+def cmd_topic(args):
+    # has this topic trended in past runs? read from the title/tag index, no API calls
+    db.ensure_db()
+    text = " ".join(args.words)
+    history = db.search_topic_history(text)
+    if history.empty:
+        print(f"No stored videos match '{text}'", file=sys.stderr)
+        return 1
+    for row in history.itertuples():
+        print(f"{row.started_at:%Y-%m-%d %H:%M}  {row.videos:>6} videos  {row.channels:>5} channels  "
+              f"virality {row.virality:>5.1f} (max {row.virality_max:>3})")
+    for row in db.search_topic_channels(text, limit=args.channels).itertuples():
+        print(f"{row.virality_max:>3}  {row.videos:>5} videos  {row.channel_title}")
+    return 0
+
+def cmd_watch(args):
+    from . import watchlist
+    db.ensure_db()
+    if args.action in ("add", "remove"):
+        ids = list(args.channel_ids)
+        if args.action == "add" and args.top:
+            ids += db.load_top_history_channels(args.top)
+        if not ids:
+            print("Give channel ids (or --top N to add the most viral channels from saved runs).", file=sys.stderr)
+            return 2
+        if args.action == "add":
+            print(f"Watching {db.add_to_watchlist(ids)} more channels", file=sys.stderr)
+        else:
+            print(f"Stopped watching {db.remove_from_watchlist(ids)} channels", file=sys.stderr)
+    elif args.action == "list":
+        for cid, title, subs, polled_at in db.load_watchlist():
+            polled = polled_at.isoformat(sep=" ", timespec="minutes") if polled_at else "never"
+            print(f"{cid}  {subs if subs is not None else '-':>10}  {polled:<16}  {title}")
+    else:
+        def report(summary):
+            for msg in summary["errors"]:
+                print(msg, file=sys.stderr)
+            print(f"{summary['polled']}/{summary['channels']} channels polled, {summary['quota']} quota units"
+                  + (f", {summary['missing']} missing" if summary["missing"] else ""), file=sys.stderr)
+        options = dict(concurrency=args.concurrency, requests_per_second=args.rps, daily_quota_budget=args.quota_budget)
+        if not args.every:
+            report(watchlist.refresh_watchlist(**options))
+            return 0
+        try:
+            watchlist.run_refresher(args.every, on_refresh=report, **options)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+def cmd_worker(args):
+    try:
+        jobs.work(once=args.once, poll_seconds=args.poll)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def cmd_crawl(args):
+    from .crawler import run_crawler
+    try:
+        run_crawler(args.config, once=args.once, processes=args.processes)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def cmd_fake_api(args):
+    from .fakeapi import make_server, FakeYouTube
+    server = make_server(FakeYouTube(n_videos=args.videos, videos_per_channel=args.videos_per_channel,
+                                     latency_ms=args.latency_ms), args.port)
+    print(f"Fake YouTube API on http://127.0.0.1:{server.server_address[1]} "
+          f"(set YOUTUBE_API_BASE to use it)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def cmd_bench(args):
+    from . import bench
+    results = bench.run_benchmarks(args.scales, latency_ms=args.latency_ms, concurrency=args.concurrency,
+                                   memory=not args.no_memory,
+                                   on_scale=lambda n, scale: print(bench.format_scale(n, scale), file=sys.stderr))
+    bench.save_results(results, args.out)
+    print(f"Results saved: {args.out}", file=sys.stderr)
+    if not args.baseline:
+        return 0
+    if not os.path.exists(args.baseline):
+        bench.save_results(results, args.baseline)
+        print(f"No baseline yet; saved this run as {args.baseline}", file=sys.stderr)
+        return 0
+    regressions = bench.compare_results(bench.load_results(args.baseline), results, args.tolerance)
+    for msg in regressions:
+        print(f"REGRESSION {msg}", file=sys.stderr)
+    print(f"{len(regressions)} regressions against {args.baseline}", file=sys.stderr)
+    return 1 if regressions else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="viralscope", description="ViralScope headless scans")
+    parser.add_argument("--db", default=db.DB_FILE, help="SQLite database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_scan = sub.add_parser("scan", help="run a keyword scan")
+    add_scan_arguments(p_scan)
+    p_scan.add_argument("--json", action="store_true", help="print channel cards as JSON")
+    p_scan.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    p_scan.add_argument("--background", action="store_true", help="queue the scan for a worker and print its job id")
+    p_scan.set_defaults(func=cmd_scan)
+    p_migrate = sub.add_parser("migrate", help="upgrade the database schema")
+    p_migrate.add_argument("--vacuum", action="store_true", help="reclaim space freed by the upgrade")
+    p_migrate.set_defaults(func=cmd_migrate)
+    p_rollups = sub.add_parser("rebuild-rollups", help="recompute channel trend rollups from stored samples")
+    p_rollups.set_defaults(func=cmd_rebuild_rollups)
+    p_topic = sub.add_parser("topic", help="virality of stored videos whose titles or tags match, per past run")
+    p_topic.add_argument("words", nargs="+", help="words that must all appear (prefixes match)")
+    p_topic.add_argument("--channels", type=int, default=10, help="top matching channels to list")
+    p_topic.set_defaults(func=cmd_topic)
+    p_watch = sub.add_parser("watch", help="channel watchlist: subscriber counts polled with channels.list (1 unit per 50)")
+    p_watch.add_argument("action", choices=["add", "remove", "list", "refresh"])
+    p_watch.add_argument("channel_ids", nargs="*", help="channel ids to add or remove")
+    p_watch.add_argument("--top", type=int, default=0, help="add: also the N most viral channels from saved runs")
+    p_watch.add_argument("--every", type=float, default=0, help="refresh: repeat every N minutes until interrupted")
+    p_watch.add_argument("--concurrency", type=int, default=DEFAULT_SCAN_CONCURRENCY)
+    p_watch.add_argument("--rps", type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="max API requests per second (0 = unlimited)")
+    p_watch.add_argument("--quota-budget", type=int, default=DEFAULT_DAILY_QUOTA, help="daily quota budget in units")
+    p_watch.set_defaults(func=cmd_watch)
+    p_worker = sub.add_parser("worker", help="run queued background scans")
+    p_worker.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    p_worker.add_argument("--poll", type=float, default=jobs.POLL_SECONDS, help="seconds between queue checks")
+    p_worker.set_defaults(func=cmd_worker)
+    p_crawl = sub.add_parser("crawl", help="run scheduled keyword sets from a JSON config, sharded over processes")
+    p_crawl.add_argument("config", help="crawler config file (see crawler.example.json)")
+    p_crawl.add_argument("--once", action="store_true", help="run the scans that are due, then exit")
+    p_crawl.add_argument("--processes", type=int, help="worker processes (default: config, else CPU count)")
+    p_crawl.set_defaults(func=cmd_crawl)
+    p_fake = sub.add_parser("fake-api", help="serve a synthetic stand-in for the YouTube Data API")
+    p_fake.add_argument("--port", type=int, default=8765)
+    p_fake.add_argument("--videos", type=int, default=10000, help="size of the synthetic video corpus")
+    p_fake.add_argument("--videos-per-channel", type=int, default=10)
+    p_fake.add_argument("--latency-ms", type=float, default=0, help="delay added to every response")
+    p_fake.set_defaults(func=cmd_fake_api)
+    p_bench = sub.add_parser("bench", help="benchmark full scans against the fake API")
+    p_bench.add_argument("--scales", type=lambda v: [int(n) for n in v.split(",")], default=[10, 100, 1000, 10000, 100000],
+                         help="comma separated video counts")
+    p_bench.add_argument("--latency-ms", type=float, default=0, help="fake API response delay")
+    p_bench.add_argument("--concurrency", type=int, default=DEFAULT_SCAN_CONCURRENCY)
+    p_bench.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass (timings only)")
+    p_bench.add_argument("--out", default="bench_results.json", help="where to save this run's results")
+    p_bench.add_argument("--baseline", help="results file to compare against (created from this run if missing)")
+    p_bench.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput / memory change, as a fraction")
+    p_bench.set_defaults(func=cmd_bench)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db.set_db_file(args.db)
+    return args.func(args)
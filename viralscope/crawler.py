@@ -0,0 +1,246 @@
+# viralscope/crawler.py
+"""Scheduled crawler: keyword sets and schedules come from a JSON config, and each
+scan's keywords are sharded across a process pool. Workers only search and enrich
+(network, no DB); the coordinator looks up the channels they found once, across all
+shards, and is the only process that writes to the database."""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from datetime import datetime, timedelta
+import json
+import os
+import re
+import sys
+import time
+
+from . import db
+from .metrics import StageTimer, merge_endpoint_stats
+from .watchlist import refresh_watchlist
+from .api import (
+    MAX_SCAN_CONCURRENCY, QuotaLedger, YouTubeClient, estimate_scan_quota, make_http_session, merge_quota_snapshots,
+)
+from .engine import (
+    ScanConfig, ScanResult, VideoStore, channel_phase, finish_scan, fit_scan_to_budget, history_channel_seeds,
+    keyword_windows, merge_scan_results, search_phase,
+)
+
+CRAWL_TICK_SECONDS = 30
+DEFAULT_EVERY_MINUTES = 24 * 60
+SCAN_FIELDS = {f.name for f in fields(ScanConfig)}
+WATCHLIST_SCHEDULE = "(watchlist)"  # crawl_schedule name of the watchlist refresh
+
+# -------------------------
+# Config
+# -------------------------
+# {
+#   "processes": 4,
+#   "defaults": {"days": 7, "results_per_keyword": 50, "cache_mode": "cache"},
+#   "scans": [
+#     {"name": "stories", "every_minutes": 360, "keywords": ["AITA Update", "Reddit Cheating"]},
+#     {"name": "finance", "keywords_file": "finance.txt", "results_per_keyword": 100}
+#   ],
+#   "watchlist_every_minutes": 60
+# }
+def load_crawl_config(path):
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = raw.get("defaults", {})
+    scans = []
+    for entry in raw.get("scans", []):
+        settings = dict(defaults, **{k: v for k, v in entry.items() if k not in ("name", "every_minutes", "keywords_file")})
+        unknown = set(settings) - SCAN_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown scan settings in '{entry.get('name')}': {', '.join(sorted(unknown))}")
+        keywords = list(settings.pop("keywords", []))
+        if entry.get("keywords_file"):
+            with open(os.path.join(base_dir, entry["keywords_file"]), encoding="utf-8") as f:
+                keywords.extend(k.strip() for k in re.split(r"[\n,]+", f.read()) if k.strip())
+        if not entry.get("name") or not keywords:
+            raise ValueError("Every scan needs a name and at least one keyword")
+        scans.append({
+            "name": entry["name"],
+            "every": timedelta(minutes=entry.get("every_minutes", DEFAULT_EVERY_MINUTES)),
+            "config": ScanConfig(keywords=list(dict.fromkeys(keywords)), **settings),
+        })
+    # the watchlist refresh takes its API keys, rate limits and quota budget from the defaults
+    watchlist = None
+    if raw.get("watchlist_every_minutes"):
+        watchlist = {"every": timedelta(minutes=raw["watchlist_every_minutes"]), "config": ScanConfig(keywords=[], **defaults)}
+    return {"processes": raw.get("processes") or os.cpu_count() or 1, "scans": scans, "watchlist": watchlist}
+
+def due_scans(scans, last_started, now):
+    return [scan for scan in scans if scan["name"] not in last_started or now - last_started[scan["name"]] >= scan["every"]]
+
+# -------------------------
+# Shards (worker processes)
+# -------------------------
+def shard_keywords(keywords, n_shards):
+    # round robin, so a shard does not get all the deep keywords of a budget plan
+    return [shard for shard in (keywords[i::n_shards] for i in range(n_shards)) if shard]
+
+def shard_quota(shard, depth):
+    # a shard's search + videos upper bound; budget fitting already made the whole scan fit
+    estimate = estimate_scan_quota(len(shard), {kw: depth[kw] for kw in shard})
+    return estimate["search"] + estimate["videos"]
+
+def crawl_shard(task):
+    # runs in a worker process: search + enrichment for a few keywords, no DB access
+    now = datetime.fromisoformat(task["now"])
+    concurrency = max(1, min(task["concurrency"], MAX_SCAN_CONCURRENCY))
+    ledger = QuotaLedger(budget=task["quota_budget"])
+    client = YouTubeClient(make_http_session(concurrency * 2), ledger, api_keys=task["api_keys"],
+                           requests_per_second=task["requests_per_second"], cache_mode=task["cache_mode"])
+    try:
+        search_results, store, errors = search_phase(client, task["keywords"], task["since"], task["depth"], now, concurrency,
+                                                     task["min_views"], task["min_virality"])
+    finally:
+        client.close()
+    ids = [it.get("id", {}).get("videoId") for result in search_results for it in result["items"]]
+    return {
+        "search_results": search_results,
+        "videos": [vi for vi in map(store.get, dict.fromkeys(ids)) if vi],
+        "quota": ledger.snapshot(),
+        "stats": client.stats,
+        "api": client.endpoint_stats(),
+    }
+
+# -------------------------
+# Coordinator
+# -------------------------
+def crawl_scan(pool, config, n_shards, now=None):
+    # one scheduled scan: the same steps and outputs as run_scan, with search sharded
+    started = time.perf_counter()
+    timer = StageTimer()
+    now = now or datetime.utcnow()
+    result = ScanResult(started_at=now, keywords=list(config.keywords))
+    scan_depth, quota_budget, notice = fit_scan_to_budget(config, now)
+    if notice:
+        result.notices.append(notice)
+    if not scan_depth:
+        return result
+    depth = scan_depth if isinstance(scan_depth, dict) else {kw: scan_depth for kw in config.keywords}
+    keywords = [kw for kw in config.keywords if depth.get(kw)]
+    window_start = now - timedelta(days=config.days)
+    published_after = window_start.isoformat("T") + "Z"
+    since, history_rows = keyword_windows(keywords, published_after, window_start if config.incremental else None)
+
+    shards = shard_keywords(keywords, n_shards)
+    keys = list(config.api_keys)
+    futures = []
+    for i, shard in enumerate(shards):
+        futures.append(pool.submit(crawl_shard, {
+            "keywords": shard,
+            "since": {kw: since[kw] for kw in shard},
+            "depth": {kw: depth[kw] for kw in shard},
+            "now": now.isoformat(),
+            # each shard starts on a different key, so more keys means more parallel quota
+            "api_keys": keys[i % len(keys):] + keys[:i % len(keys)] if keys else keys,
+            "quota_budget": None if quota_budget is None else shard_quota(shard, depth),
+            "concurrency": config.concurrency,
+            "requests_per_second": config.requests_per_second,
+            "cache_mode": config.cache_mode,
+            "min_views": config.stop_below_views,
+            "min_virality": config.stop_below_virality,
+        }))
+    by_keyword = {}
+    store = VideoStore()
+    shard_stats = []
+    # "search" is the coordinator's wait for the shards, not the sum of their times
+    failed = None
+    with timer.stage("search"):
+        for fut in futures:
+            try:
+                shard = fut.result()
+            except Exception as exc:
+                # wait for the others all the same: what they spent counts against the day
+                failed = failed or exc
+                continue
+            for search in shard["search_results"]:
+                by_keyword[search["keyword"]] = search
+            store.claim([vi.get("id") for vi in shard["videos"]])
+            store.add(shard["videos"])
+            shard_stats.append(shard)
+    spent = sum(shard["quota"]["total"] for shard in shard_stats)
+    if failed:
+        db.record_quota_spend(now, spent)
+        raise failed
+    search_results = [by_keyword[kw] for kw in keywords]
+    timer.add("search", rows=sum(len(search["items"]) for search in search_results))
+    for search in search_results:
+        result.errors.extend(search["errors"])
+
+    # channels from every shard, each looked up once; the coordinator's spend counts
+    # against what the shards left of the budget
+    ledger = QuotaLedger(budget=None if quota_budget is None else max(0, quota_budget - spent))
+    client = YouTubeClient(make_http_session(config.concurrency), ledger, api_keys=keys,
+                           requests_per_second=config.requests_per_second, cache_mode=config.cache_mode)
+    try:
+        with timer.stage("channels"):
+            channel_map, channel_errors, stats = channel_phase(client, history_channel_seeds(search_results, history_rows),
+                                                               config.subs_ttl_hours, now, config.concurrency)
+    finally:
+        client.close()
+        db.record_quota_spend(now, spent + ledger.total)
+    timer.add("channels", rows=len(channel_map))
+    result.errors.extend(channel_errors)
+    stats["quota"] = merge_quota_snapshots([shard["quota"] for shard in shard_stats] + [ledger.snapshot()])
+    for name, value in client.stats.items():
+        stats[name] = value + sum(shard["stats"].get(name, 0) for shard in shard_stats)
+    stats["api"] = merge_endpoint_stats([shard["api"] for shard in shard_stats] + [client.endpoint_stats()])
+    stats["shards"] = len(shards)
+    if config.incremental:
+        stats["keywords_incremental"] = sum(1 for kw in keywords if since[kw] != published_after)
+    with timer.stage("scoring"):
+        all_video_rows, merge_stats = merge_scan_results(search_results, store, history_rows, channel_map, now)
+    timer.add("scoring", rows=len(all_video_rows))
+    stats.update(merge_stats)
+    result.stats = stats
+    finish_scan(config, result, channel_map, now, timer, started)
+    return result
+
+def log(msg):
+    print(f"{datetime.utcnow().isoformat(timespec='seconds')} {msg}", file=sys.stderr, flush=True)
+
+def crawl_watchlist(config):
+    started = datetime.utcnow()
+    try:
+        summary = refresh_watchlist(api_keys=config.api_keys, concurrency=config.concurrency,
+                                    requests_per_second=config.requests_per_second,
+                                    daily_quota_budget=config.daily_quota_budget, now=started)
+    except Exception as err:
+        db.record_crawl(WATCHLIST_SCHEDULE, started, None, f"failed: {err}")
+        log(f"watchlist: failed: {err}")
+        return
+    for msg in summary["errors"]:
+        log(f"watchlist: {msg}")
+    db.record_crawl(WATCHLIST_SCHEDULE, started, None, "done")
+    log(f"watchlist: {summary['polled']}/{summary['channels']} channels polled, {summary['quota']} quota units")
+
+def run_crawler(config_path, once=False, processes=None):
+    # the config is re-read every tick, so edited keyword sets apply without a restart
+    db.ensure_db()
+    n_shards = processes or load_crawl_config(config_path)["processes"]
+    with ProcessPoolExecutor(max_workers=n_shards) as pool:
+        while True:
+            crawl = load_crawl_config(config_path)
+            for scan in due_scans(crawl["scans"], db.load_crawl_schedule(), datetime.utcnow()):
+                started = datetime.utcnow()
+                log(f"{scan['name']}: {len(scan['config'].keywords)} keywords over {n_shards} processes")
+                try:
+                    result = crawl_scan(pool, scan["config"], n_shards, now=started)
+                except Exception as err:
+                    db.record_crawl(scan["name"], started, None, f"failed: {err}")
+                    log(f"{scan['name']}: failed: {err}")
+                    continue
+                for msg in result.notices + result.errors:
+                    log(f"{scan['name']}: {msg}")
+                db.record_crawl(scan["name"], started, result.run_id, "done")
+                log(f"{scan['name']}: {len(result.channel_cards)} channels, {len(result.db_rows)} videos, "
+                    f"{result.stats.get('quota', {}).get('total', 0)} quota units in {(datetime.utcnow() - started).total_seconds():.0f}s")
+            watchlist = crawl["watchlist"]
+            if watchlist and due_scans([{"name": WATCHLIST_SCHEDULE, "every": watchlist["every"]}], db.load_crawl_schedule(),
+                                       datetime.utcnow()):
+                crawl_watchlist(watchlist["config"])
+            if once:
+                return
+            time.sleep(CRAWL_TICK_SECONDS)
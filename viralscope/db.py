@@ -0,0 +1,938 @@
+# viralscope/db.py
+"""SQLite storage for runs, video samples and caches (no video_id retained/shown)."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import json
+import re
+import sqlite3
+import threading
+
+from .topics import TOPIC_MIN_VIDEOS, TOPIC_RECENT_RUNS, TOPIC_SUGGESTIONS, count_run_phrases, rank_rising
+from .utils import safe_int, video_key
+
+DB_FILE = "viral_scope.db"
+CHANNEL_SUBS_TTL_HOURS = 24  # default; subscriber counts drift, so they expire first
+CHANNEL_PROFILE_TTL_HOURS = 24 * 7  # title + avatar
+
+_init_lock = threading.Lock()
+_initialized = set()
+
+def set_db_file(path):
+    global DB_FILE
+    DB_FILE = path
+
+def ensure_columns(cur, table, columns):
+    # additive upgrade for tables created before a column existed
+    existing = {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns:
+        if name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+def connect(check_same_thread=True):
+    # every connection: WAL lets dashboard reads run while a scan is writing
+    conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+@contextmanager
+def reading(conn=None):
+    # dashboard readers accept a long-lived shared connection; otherwise open one per call
+    if conn is not None:
+        yield conn
+        return
+    conn = connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+# -------------------------
+# Schema migrations (PRAGMA user_version)
+# -------------------------
+# Each step is idempotent so databases created before versioning (user_version 0
+# but with some tables already present) upgrade in place.
+def _migrate_base_tables(cur):
+    # runs
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            started_at TEXT,
+            days INTEGER,
+            keywords TEXT,
+            notes TEXT
+        )
+    """)
+    # video_samples: keep channel_id internally, but CSV/exports will show channel_title only
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS video_samples (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT,
+            keyword TEXT,
+            title TEXT,
+            channel_id TEXT,
+            channel_title TEXT,
+            channel_subs INTEGER,
+            views INTEGER,
+            likes INTEGER,
+            comments INTEGER,
+            duration_seconds INTEGER,
+            thumbnail TEXT,
+            published_at TEXT,
+            virality INTEGER,
+            monetization_likelihood INTEGER,
+            saved_at TEXT
+        )
+    """)
+
+def _migrate_run_quota(cur):
+    # quota_by_stage / quota_by_keyword are JSON objects of units spent
+    ensure_columns(cur, "runs", [
+        ("quota_units", "INTEGER"),
+        ("quota_by_stage", "TEXT"),
+        ("quota_by_keyword", "TEXT"),
+    ])
+
+def _migrate_channel_cache(cur):
+    # channels: metadata cache; created date/country never expire, profile and subs do
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id TEXT PRIMARY KEY,
+            title TEXT,
+            published_at TEXT,
+            country TEXT,
+            avatar TEXT,
+            subs INTEGER,
+            profile_fetched_at TEXT,
+            subs_fetched_at TEXT
+        )
+    """)
+
+def _migrate_keyword_watermarks(cur):
+    # keyword_watermarks: scan start of the last saved run per keyword (incremental scans)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS keyword_watermarks (
+            keyword TEXT PRIMARY KEY,
+            scanned_until TEXT,
+            run_id TEXT
+        )
+    """)
+
+def _migrate_sample_indexes(cur):
+    # dashboard filters samples by channel and groups by saved_at; deletes/joins go by run
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_video_samples_channel_saved ON video_samples(channel_id, saved_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_video_samples_run ON video_samples(run_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at)")
+
+def _migrate_normalized_samples(cur):
+    # videos: one row per video under a hashed key (the raw id is never stored);
+    # video_observations: per-run counters only; channel titles live in `channels`.
+    # video_samples becomes a view with its old columns so readers keep working.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS videos (
+            video_key TEXT PRIMARY KEY,
+            channel_id TEXT,
+            title TEXT,
+            duration_seconds INTEGER,
+            thumbnail TEXT,
+            published_at TEXT,
+            first_seen_at TEXT,
+            last_seen_at TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS video_observations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT,
+            video_key TEXT,
+            keyword TEXT,
+            channel_subs INTEGER,
+            views INTEGER,
+            likes INTEGER,
+            comments INTEGER,
+            virality INTEGER,
+            monetization_likelihood INTEGER,
+            saved_at TEXT
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos(channel_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_videos_published ON videos(published_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_observations_video_saved ON video_observations(video_key, saved_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_observations_run ON video_observations(run_id)")
+    legacy = cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'video_samples' AND type = 'table'").fetchone()
+    if legacy:
+        migrate_video_samples(cur)
+        cur.execute("DROP TABLE video_samples")
+    cur.execute("""
+        CREATE VIEW IF NOT EXISTS video_samples AS
+        SELECT o.id, o.run_id, o.keyword, v.title, v.channel_id, c.title AS channel_title, o.channel_subs,
+               o.views, o.likes, o.comments, v.duration_seconds, v.thumbnail, v.published_at,
+               o.virality, o.monetization_likelihood, o.saved_at, o.video_key
+        FROM video_observations o
+        JOIN videos v ON v.video_key = o.video_key
+        LEFT JOIN channels c ON c.channel_id = v.channel_id
+    """)
+
+def migrate_video_samples(cur):
+    # copy the old denormalized table into videos/channels/video_observations; legacy rows
+    # never had an id, so their key hashes (channel, title, published)
+    cur.connection.create_function("video_key", 4, video_key, deterministic=True)
+    cur.execute("""
+        INSERT OR IGNORE INTO videos
+        (video_key, channel_id, title, duration_seconds, thumbnail, published_at, first_seen_at, last_seen_at)
+        SELECT video_key(NULL, channel_id, title, published_at), channel_id, title, MAX(duration_seconds),
+               MAX(thumbnail), published_at, MIN(saved_at), MAX(saved_at)
+        FROM video_samples GROUP BY channel_id, title, published_at
+    """)
+    # newest title per channel; MAX() makes SQLite take the other columns from that row
+    cur.execute("""
+        INSERT INTO channels(channel_id, title)
+        SELECT channel_id, channel_title FROM (
+            SELECT channel_id, channel_title, MAX(saved_at) FROM video_samples
+            WHERE channel_id IS NOT NULL AND channel_title IS NOT NULL GROUP BY channel_id
+        ) WHERE true
+        ON CONFLICT(channel_id) DO UPDATE SET title = COALESCE(channels.title, excluded.title)
+    """)
+    cur.execute("""
+        INSERT INTO video_observations
+        (run_id, video_key, keyword, channel_subs, views, likes, comments, virality, monetization_likelihood, saved_at)
+        SELECT run_id, video_key(NULL, channel_id, title, published_at), keyword, channel_subs, views, likes, comments,
+               virality, monetization_likelihood, saved_at
+        FROM video_samples ORDER BY id
+    """)
+
+def _migrate_channel_rollups(cur):
+    # channel_run_rollups: one row per channel per run, kept current by save_run_to_db
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS channel_run_rollups (
+            channel_id TEXT,
+            run_id TEXT,
+            saved_at TEXT,
+            views INTEGER,
+            virality_mean REAL,
+            virality_max INTEGER,
+            sample_count INTEGER,
+            subs INTEGER,
+            PRIMARY KEY (channel_id, run_id)
+        )
+    """)
+    refresh_channel_rollups(cur)
+
+ROLLUP_QUERY = """
+    SELECT v.channel_id, o.run_id, MAX(o.saved_at), COALESCE(SUM(o.views), 0), AVG(o.virality), MAX(o.virality),
+           COUNT(*), MAX(o.channel_subs)
+    FROM video_observations o JOIN videos v ON v.video_key = o.video_key
+    WHERE v.channel_id IS NOT NULL {run_filter}
+    GROUP BY o.run_id, v.channel_id
+"""
+
+def refresh_channel_rollups(cur, run_id=None):
+    # recompute the rollups of one run, or of every run when run_id is None
+    if run_id is None:
+        cur.execute("DELETE FROM channel_run_rollups")
+        cur.execute("INSERT INTO channel_run_rollups " + ROLLUP_QUERY.format(run_filter=""))
+    else:
+        cur.execute("DELETE FROM channel_run_rollups WHERE run_id = ?", (run_id,))
+        cur.execute("INSERT INTO channel_run_rollups " + ROLLUP_QUERY.format(run_filter="AND o.run_id = ?"), (run_id,))
+
+def rebuild_channel_rollups():
+    conn = connect()
+    with conn:
+        refresh_channel_rollups(conn)
+        bump_data_version(conn)
+    count = conn.execute("SELECT COUNT(*) FROM channel_run_rollups").fetchone()[0]
+    conn.close()
+    return count
+
+def _migrate_meta(cur):
+    # meta: small key/value state; data_version goes up with every saved run so
+    # cached dashboard reads know when to reload
+    cur.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+    cur.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('data_version', 0)")
+
+def bump_data_version(conn):
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+def load_data_version(conn=None):
+    with reading(conn) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return row[0] if row else 0
+
+def _migrate_scan_jobs(cur):
+    # scan_jobs: background scan queue (see jobs.py); scan_job_keywords: per-keyword
+    # checkpoints of a job in progress, deleted when the job finishes
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scan_jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT,
+            config TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            heartbeat_at TEXT,
+            worker TEXT,
+            attempts INTEGER DEFAULT 0,
+            progress_done INTEGER DEFAULT 0,
+            progress_total INTEGER DEFAULT 0,
+            progress_label TEXT,
+            result TEXT,
+            error TEXT
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scan_jobs_status ON scan_jobs(status, created_at)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scan_job_keywords (
+            job_id TEXT,
+            keyword TEXT,
+            checkpoint TEXT,
+            finished_at TEXT,
+            PRIMARY KEY (job_id, keyword)
+        )
+    """)
+
+def _migrate_crawl_schedule(cur):
+    # crawl_schedule: last start of each scheduled keyword set (see crawler.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_schedule (
+            name TEXT PRIMARY KEY,
+            last_started_at TEXT,
+            last_run_id TEXT,
+            last_status TEXT
+        )
+    """)
+
+def _migrate_run_metrics(cur):
+    # metrics: JSON profile of the scan (stage timings, API counters; see metrics.py)
+    ensure_columns(cur, "runs", [("metrics", "TEXT")])
+
+def _migrate_video_search(cur):
+    # video_search: FTS5 index over video titles and tags (comma-separated), one row per
+    # video under the video's rowid; save_run_to_db re-indexes the videos each run saw
+    ensure_columns(cur, "videos", [("tags", "TEXT")])
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS video_search
+        USING fts5(title, tags, tokenize = 'unicode61 remove_diacritics 2')
+    """)
+    refresh_video_search(cur)
+
+RUN_VIDEOS = "SELECT video_key FROM video_observations WHERE run_id = ?"
+
+def refresh_video_search(cur, run_id=None):
+    # re-index the videos observed in one run, or every video when run_id is None
+    if run_id is None:
+        cur.execute("DELETE FROM video_search")
+        cur.execute("INSERT INTO video_search(rowid, title, tags) SELECT rowid, title, COALESCE(tags, '') FROM videos")
+    else:
+        cur.execute(f"DELETE FROM video_search WHERE rowid IN (SELECT rowid FROM videos WHERE video_key IN ({RUN_VIDEOS}))",
+                    (run_id,))
+        cur.execute(f"""
+            INSERT INTO video_search(rowid, title, tags)
+            SELECT rowid, title, COALESCE(tags, '') FROM videos WHERE video_key IN ({RUN_VIDEOS})
+        """, (run_id,))
+
+def rebuild_video_search(conn=None):
+    own = conn is None
+    conn = conn or connect()
+    with conn:
+        refresh_video_search(conn)
+    count = conn.execute("SELECT COUNT(*) FROM video_search").fetchone()[0]
+    if own:
+        conn.close()
+    return count
+
+def _migrate_run_topics(cur):
+    # run_topics: virality-weighted phrase counts of each run (see topics.py);
+    # topic_totals: the same summed over every run; runs.topic_weight: the run's whole
+    # weight, which phrase shares are taken of
+    ensure_columns(cur, "runs", [("topic_weight", "REAL")])
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS run_topics (
+            run_id TEXT,
+            phrase TEXT,
+            weight REAL,
+            videos INTEGER,
+            PRIMARY KEY (run_id, phrase)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS topic_totals (
+            phrase TEXT PRIMARY KEY,
+            weight REAL,
+            videos INTEGER
+        ) WITHOUT ROWID
+    """)
+    refresh_run_topics(cur)
+
+def refresh_run_topics(cur, run_id=None, counted=None):
+    # count one run's phrases and add them to the totals, or recount every run when run_id is None;
+    # counted is count_run_phrases() of the run's rows when the caller has them in memory
+    if run_id is None:
+        cur.execute("DELETE FROM run_topics")
+        cur.execute("DELETE FROM topic_totals")
+        run_ids = [row[0] for row in cur.execute("SELECT run_id FROM runs").fetchall()]
+    else:
+        # a run saved again replaces its earlier counts
+        cur.execute("""
+            UPDATE topic_totals SET weight = topic_totals.weight - r.weight, videos = topic_totals.videos - r.videos
+            FROM (SELECT phrase, weight, videos FROM run_topics WHERE run_id = ?) r WHERE topic_totals.phrase = r.phrase
+        """, (run_id,))
+        cur.execute("DELETE FROM run_topics WHERE run_id = ?", (run_id,))
+        run_ids = [run_id]
+    for rid in run_ids:
+        counts, total = counted or count_run_phrases(cur.execute("""
+            SELECT v.title, v.tags, o.virality FROM video_observations o JOIN videos v ON v.video_key = o.video_key
+            WHERE o.run_id = ?
+        """, (rid,)).fetchall())
+        cur.executemany("INSERT INTO run_topics(run_id, phrase, weight, videos) VALUES (?,?,?,?)",
+                        [(rid, phrase, weight, videos) for phrase, (weight, videos) in counts.items()])
+        cur.execute("UPDATE runs SET topic_weight = ? WHERE run_id = ?", (total, rid))
+    if run_id is None:
+        cur.execute("INSERT INTO topic_totals SELECT phrase, SUM(weight), SUM(videos) FROM run_topics GROUP BY phrase")
+    else:
+        cur.execute("""
+            INSERT INTO topic_totals(phrase, weight, videos)
+            SELECT phrase, weight, videos FROM run_topics WHERE run_id = ? AND true
+            ON CONFLICT(phrase) DO UPDATE SET weight = topic_totals.weight + excluded.weight,
+                                              videos = topic_totals.videos + excluded.videos
+        """, (run_id,))
+
+def _migrate_channel_watchlist(cur):
+    # channel_watchlist: channels polled with channels.list alone (see watchlist.py);
+    # channel_stats: their counters per poll, clustered by channel, polled_at in unix seconds;
+    # watchlist_polls: one row per refresh, so its quota counts against the day's budget
+    cur.execute("CREATE TABLE IF NOT EXISTS channel_watchlist (channel_id TEXT PRIMARY KEY, added_at TEXT)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS channel_stats (
+            channel_id TEXT,
+            polled_at INTEGER,
+            subs INTEGER,
+            views INTEGER,
+            videos INTEGER,
+            PRIMARY KEY (channel_id, polled_at)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS watchlist_polls (
+            polled_at TEXT PRIMARY KEY,
+            channels INTEGER,
+            missing INTEGER,
+            quota_units INTEGER
+        )
+    """)
+
+def _migrate_quota_spend(cur):
+    # quota_spend: units every scan spent, saved or not (runs only hold the saved ones);
+    # seeded from the runs so today's spend carries over the upgrade
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS quota_spend (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spent_at TEXT,
+            source TEXT,
+            quota_units INTEGER
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_quota_spend_at ON quota_spend(spent_at)")
+    cur.execute("""
+        INSERT INTO quota_spend(spent_at, source, quota_units)
+        SELECT started_at, 'scan', quota_units FROM runs WHERE quota_units > 0
+    """)
+
+def _migrate_legacy_video_keys(cur):
+    # legacy_videos: videos still under the (channel, title, published) key of rows saved
+    # before ids were hashed; save_run_to_db moves each to its id key when it is seen again.
+    # Videos seen again before this table existed are stored twice, so those are merged now
+    cur.execute("CREATE TABLE IF NOT EXISTS legacy_videos (video_key TEXT PRIMARY KEY) WITHOUT ROWID")
+    cur.connection.create_function("video_key", 4, video_key, deterministic=True)
+    cur.execute("""
+        INSERT OR IGNORE INTO legacy_videos
+        SELECT video_key FROM videos WHERE video_key = video_key(NULL, channel_id, title, published_at)
+    """)
+    merge_legacy_videos(cur, cur.execute("""
+        SELECT l.video_key, MIN(v.video_key) FROM legacy_videos l
+        JOIN videos o ON o.video_key = l.video_key
+        JOIN videos v ON v.channel_id = o.channel_id AND v.title = o.title AND v.published_at IS o.published_at
+                     AND v.video_key != o.video_key
+        GROUP BY l.video_key
+    """).fetchall())
+
+def merge_legacy_videos(cur, pairs):
+    # pairs of (legacy key, id key) of the same video: the legacy row takes the id key, or
+    # hands its observations to the row already stored under it and goes
+    for legacy, key in pairs:
+        if cur.execute("SELECT 1 FROM videos WHERE video_key = ?", (key,)).fetchone():
+            cur.execute("""
+                UPDATE videos SET first_seen_at = MIN(first_seen_at, COALESCE(
+                    (SELECT first_seen_at FROM videos WHERE video_key = ?), first_seen_at))
+                WHERE video_key = ?
+            """, (legacy, key))
+            cur.execute("DELETE FROM video_search WHERE rowid = (SELECT rowid FROM videos WHERE video_key = ?)", (legacy,))
+            cur.execute("DELETE FROM videos WHERE video_key = ?", (legacy,))
+        else:
+            # the rowid, and with it the search index entry, stays
+            cur.execute("UPDATE videos SET video_key = ? WHERE video_key = ?", (key, legacy))
+        cur.execute("UPDATE video_observations SET video_key = ? WHERE video_key = ?", (key, legacy))
+        cur.execute("DELETE FROM legacy_videos WHERE video_key = ?", (legacy,))
+
+def legacy_video_pairs(cur, rows):
+    # (legacy key, id key) for the rows whose video is still stored under a legacy key
+    if not cur.execute("SELECT 1 FROM legacy_videos LIMIT 1").fetchone():
+        return []
+    candidates = {}
+    for r in rows:
+        legacy = video_key(None, r.get("channel_id"), r.get("title"), r.get("published_at"))
+        if r.get("video_key") and r.get("video_key") != legacy:
+            candidates[legacy] = r["video_key"]
+    keys = list(candidates)
+    found = []
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        found += [row[0] for row in cur.execute(
+            f"SELECT video_key FROM legacy_videos WHERE video_key IN ({','.join('?' * len(chunk))})", chunk)]
+    return [(legacy, candidates[legacy]) for legacy in found]
+
+MIGRATIONS = [
+    (1, _migrate_base_tables),
+    (2, _migrate_run_quota),
+    (3, _migrate_channel_cache),
+    (4, _migrate_keyword_watermarks),
+    (5, _migrate_sample_indexes),
+    (6, _migrate_normalized_samples),
+    (7, _migrate_channel_rollups),
+    (8, _migrate_meta),
+    (9, _migrate_scan_jobs),
+    (10, _migrate_crawl_schedule),
+    (11, _migrate_run_metrics),
+    (12, _migrate_video_search),
+    (13, _migrate_run_topics),
+    (14, _migrate_channel_watchlist),
+    (15, _migrate_quota_spend),
+    (16, _migrate_legacy_video_keys),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version():
+    conn = connect()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    return version
+
+def init_db():
+    conn = connect()
+    cur = conn.cursor()
+    current = cur.execute("PRAGMA user_version").fetchone()[0]
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        # one transaction per step so a failure leaves the DB at the last good version
+        cur.execute("BEGIN")
+        step(cur)
+        cur.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    conn.close()
+
+def ensure_db():
+    # init_db once per process and DB path; Streamlit reruns and batch jobs both call this
+    with _init_lock:
+        if DB_FILE not in _initialized:
+            init_db()
+            _initialized.add(DB_FILE)
+
+OBSERVATION_COLUMNS = ("keyword", "channel_subs", "views", "likes", "comments", "virality", "monetization_likelihood")
+
+def save_run_to_db(run_id, started_at, days, keywords_list, notes, rows, quota=None, watermarks=None):
+    quota = quota or {}
+    now = datetime.utcnow().isoformat()
+    # rows merged back from history (incremental scans) are for cards only; their counters
+    # were stored by the run that observed them, and saving them again would invent new points
+    rows = [r for r in rows if not r.get("from_history")]
+    video_rows, observation_rows, channel_titles = [], [], {}
+    for r in rows:
+        key = r.get("video_key") or video_key(None, r.get("channel_id"), r.get("title"), r.get("published_at"))
+        video_rows.append((key, r.get("channel_id"), r.get("title"), r.get("duration_seconds"), r.get("thumbnail"),
+                           r.get("published_at"), r.get("tags") or None, now, now))
+        observation_rows.append((run_id, key, *(r.get(c) for c in OBSERVATION_COLUMNS), now))
+        if r.get("channel_id") and r.get("channel_title"):
+            channel_titles[r["channel_id"]] = r["channel_title"]
+    # counted before the write transaction, which other writers wait on
+    topics = count_run_phrases((r.get("title"), r.get("tags"), r.get("virality")) for r in rows)
+    conn = connect()
+    # run, videos (legacy keys moved to id keys), observations, rollups, search index, topic
+    # counts, watermarks and the data version commit together or not at all
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO runs(run_id, started_at, days, keywords, notes, quota_units, quota_by_stage, quota_by_keyword)
+            VALUES (?,?,?,?,?,?,?,?)
+        """, (run_id, started_at.isoformat(), days, ",".join(keywords_list), notes or "",
+              quota.get("total"), json.dumps(quota.get("by_stage", {})), json.dumps(quota.get("by_keyword", {}))))
+        merge_legacy_videos(conn, legacy_video_pairs(conn, rows))
+        # text columns are stored once per video; a re-scan only refreshes them in place
+        conn.executemany("""
+            INSERT INTO videos(video_key, channel_id, title, duration_seconds, thumbnail, published_at, tags, first_seen_at, last_seen_at)
+            VALUES (?,?,?,?,?,?,?,?,?)
+            ON CONFLICT(video_key) DO UPDATE SET
+                title = excluded.title,
+                duration_seconds = excluded.duration_seconds,
+                thumbnail = COALESCE(excluded.thumbnail, videos.thumbnail),
+                tags = COALESCE(excluded.tags, videos.tags),
+                last_seen_at = excluded.last_seen_at
+        """, video_rows)
+        # channels the metadata cache has not seen yet still need a title for the dashboard
+        conn.executemany("""
+            INSERT INTO channels(channel_id, title) VALUES (?, ?)
+            ON CONFLICT(channel_id) DO UPDATE SET title = COALESCE(channels.title, excluded.title)
+            WHERE channels.title IS NULL
+        """, list(channel_titles.items()))
+        conn.executemany(f"""
+            INSERT INTO video_observations
+            (run_id, video_key, {", ".join(OBSERVATION_COLUMNS)}, saved_at)
+            VALUES ({", ".join("?" * (len(OBSERVATION_COLUMNS) + 3))})
+        """, observation_rows)
+        refresh_channel_rollups(conn, run_id)
+        refresh_video_search(conn, run_id)
+        refresh_run_topics(conn, run_id, topics)
+        bump_data_version(conn)
+        # watermarks only advance with a saved run, otherwise an unsaved scan would hide its videos
+        conn.executemany("INSERT OR REPLACE INTO keyword_watermarks(keyword, scanned_until, run_id) VALUES (?,?,?)",
+                         [(kw, scanned_until, run_id) for kw, scanned_until in (watermarks or {}).items()])
+    conn.close()
+
+def save_run_metrics(run_id, metrics):
+    conn = connect()
+    with conn:
+        conn.execute("UPDATE runs SET metrics = ? WHERE run_id = ?", (json.dumps(metrics), run_id))
+    conn.close()
+
+def vacuum_db():
+    # dropping the old sample table leaves its pages in the file until a VACUUM; VACUUM may
+    # renumber the videos' rowids, which the search index is keyed on, so it is rebuilt
+    conn = connect()
+    conn.execute("VACUUM")
+    rebuild_video_search(conn)
+    conn.close()
+
+def load_cached_channels(channel_ids, subs_ttl_hours, now=None):
+    # returns channel_id -> cached metadata for ids whose every field is still fresh
+    if not now:
+        now = datetime.utcnow()
+    subs_cutoff = (now - timedelta(hours=subs_ttl_hours)).isoformat()
+    profile_cutoff = (now - timedelta(hours=CHANNEL_PROFILE_TTL_HOURS)).isoformat()
+    cached = {}
+    conn = connect()
+    cur = conn.cursor()
+    ids = list(channel_ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cur.execute(f"""
+            SELECT channel_id, title, published_at, country, avatar, subs FROM channels
+            WHERE channel_id IN ({",".join("?" * len(chunk))})
+              AND subs_fetched_at > ? AND profile_fetched_at > ?
+        """, (*chunk, subs_cutoff, profile_cutoff))
+        for cid, title, published_at, country, avatar, subs in cur.fetchall():
+            cached[cid] = {"title": title, "subs": subs, "published_at": published_at, "country": country, "avatar": avatar}
+    conn.close()
+    return cached
+
+def save_channels_to_cache(channel_items, now=None):
+    if not channel_items:
+        return
+    fetched_at = (now or datetime.utcnow()).isoformat()
+    rows = []
+    for ch in channel_items:
+        snip = ch.get("snippet", {})
+        rows.append((
+            ch.get("id"),
+            snip.get("title"),
+            snip.get("publishedAt"),
+            snip.get("country"),
+            snip.get("thumbnails", {}).get("default", {}).get("url"),
+            safe_int(ch.get("statistics", {}).get("subscriberCount", 0)),
+            fetched_at,
+            fetched_at
+        ))
+    conn = connect()
+    # created date and country are permanent: keep a known value if the API omits it
+    conn.executemany("""
+        INSERT INTO channels(channel_id, title, published_at, country, avatar, subs, profile_fetched_at, subs_fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(channel_id) DO UPDATE SET
+            title = excluded.title,
+            published_at = COALESCE(channels.published_at, excluded.published_at),
+            country = COALESCE(channels.country, excluded.country),
+            avatar = excluded.avatar,
+            subs = excluded.subs,
+            profile_fetched_at = excluded.profile_fetched_at,
+            subs_fetched_at = excluded.subs_fetched_at
+    """, rows)
+    conn.commit()
+    conn.close()
+
+def record_quota_spend(spent_at, quota_units, source="scan"):
+    # called once per scan, whether it was saved, found nothing or failed part way
+    if not quota_units:
+        return
+    conn = connect()
+    with conn:
+        conn.execute("INSERT INTO quota_spend(spent_at, source, quota_units) VALUES (?,?,?)",
+                     (spent_at.isoformat(), source, quota_units))
+        bump_data_version(conn)
+    conn.close()
+
+def load_quota_spent_today(now=None, conn=None):
+    # scans and watchlist refreshes
+    day_start = (now or datetime.utcnow()).strftime("%Y-%m-%dT00:00:00")
+    with reading(conn) as conn:
+        row = conn.execute("""
+            SELECT (SELECT COALESCE(SUM(quota_units), 0) FROM quota_spend WHERE spent_at >= ?)
+                 + (SELECT COALESCE(SUM(quota_units), 0) FROM watchlist_polls WHERE polled_at >= ?)
+        """, (day_start, day_start)).fetchone()
+    return row[0] or 0
+
+def load_keyword_yield(keywords, recent_runs=10):
+    # mean virality of each keyword's samples over the last few runs; None if never scanned
+    wanted = set(keywords)
+    totals = {}
+    conn = connect()
+    cur = conn.execute("""
+        SELECT keyword, virality FROM video_observations
+        WHERE run_id IN (SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?)
+    """, (recent_runs,))
+    for kw_field, virality in cur:
+        for kw in (kw_field or "").split(","):
+            if kw in wanted:
+                t = totals.setdefault(kw, [0, 0])
+                t[0] += virality or 0
+                t[1] += 1
+    conn.close()
+    return {kw: (totals[kw][0] / totals[kw][1] if kw in totals else None) for kw in keywords}
+
+def load_keyword_watermarks(keywords):
+    conn = connect()
+    cur = conn.execute("SELECT keyword, scanned_until FROM keyword_watermarks")
+    marks = {kw: ts for kw, ts in cur if kw in set(keywords)}
+    conn.close()
+    return marks
+
+def load_history_rows(keywords, window_start):
+    # latest stored observation of each video published inside the window that one of
+    # `keywords` matched; video ids are never stored, so (channel, title, published) is the key
+    wanted = set(keywords)
+    latest = {}
+    conn = connect()
+    cur = conn.execute("""
+        SELECT o.keyword, v.title, v.channel_id, c.title, o.channel_subs, o.views, o.likes, o.comments,
+               v.duration_seconds, v.thumbnail, v.published_at, o.virality, o.video_key, v.tags
+        FROM videos v
+        JOIN video_observations o ON o.video_key = v.video_key
+        LEFT JOIN channels c ON c.channel_id = v.channel_id
+        WHERE v.published_at >= ? ORDER BY o.saved_at
+    """, (window_start.isoformat(),))
+    for (kw_field, title, cid, ch_title, subs, views, likes, comments,
+         duration_s, thumbnail, published_at, virality, key, tags) in cur:
+        kws = [kw for kw in (kw_field or "").split(",") if kw in wanted]
+        if not kws:
+            continue
+        latest[(cid, title, published_at)] = {
+            "keyword": ",".join(kws),
+            "video_key": key,
+            "title": title,
+            "views": views or 0,
+            "likes": likes or 0,
+            "comments": comments or 0,
+            "duration_seconds": duration_s or 0,
+            "channel_id": cid,
+            "channel_title": ch_title,
+            "channel_subs": subs,
+            "thumbnail": thumbnail,
+            "published_at": published_at,
+            "virality": virality or 0,
+            "monetization_likelihood": None,
+            "tags": tags,
+            "from_history": True
+        }
+    conn.close()
+    return list(latest.values())
+
+def load_crawl_schedule():
+    conn = connect()
+    rows = conn.execute("SELECT name, last_started_at FROM crawl_schedule").fetchall()
+    conn.close()
+    return {name: datetime.fromisoformat(ts) for name, ts in rows if ts}
+
+def record_crawl(name, started_at, run_id, status):
+    conn = connect()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO crawl_schedule(name, last_started_at, last_run_id, last_status) VALUES (?,?,?,?)",
+                     (name, started_at.isoformat(), run_id, status))
+    conn.close()
+
+def load_runs_summary(conn=None):
+    import pandas as pd  # only the dashboard needs pandas; keep headless startup light
+    with reading(conn) as conn:
+        # metrics JSON is too wide for the runs table; it is read per run when needed
+        df = pd.read_sql_query("SELECT * FROM runs ORDER BY started_at DESC", conn, parse_dates=["started_at"])
+    return df.drop(columns=["metrics", "topic_weight"], errors="ignore")
+
+def load_trend_channels(conn=None):
+    # (channel_id, title) of every channel with history; reads only the rollup key
+    with reading(conn) as conn:
+        return conn.execute("""
+            SELECT r.channel_id, COALESCE(c.title, r.channel_id)
+            FROM (SELECT DISTINCT channel_id FROM channel_run_rollups) r
+            LEFT JOIN channels c ON c.channel_id = r.channel_id
+        """).fetchall()
+
+def load_channel_trend(channel_id, conn=None):
+    import pandas as pd
+    with reading(conn) as conn:
+        return pd.read_sql_query("""
+            SELECT saved_at, views, virality_mean AS virality, virality_max, sample_count, subs
+            FROM channel_run_rollups WHERE channel_id = ? ORDER BY saved_at
+        """, conn, params=(channel_id,), parse_dates=["saved_at"])
+
+def load_samples_for_channel(channel_id, conn=None):
+    import pandas as pd
+    with reading(conn) as conn:
+        return pd.read_sql_query("SELECT * FROM video_samples WHERE channel_id = ? ORDER BY saved_at", conn,
+                                 params=(channel_id,), parse_dates=["published_at","saved_at"])
+
+# -------------------------
+# Topic search (video_search)
+# -------------------------
+TOPIC_SEARCH_CHANNELS = 25
+
+def fts_query(text):
+    # every word of the user's text must match, each as a prefix; quoting the words keeps
+    # FTS5 syntax (AND/OR/NEAR, column filters, stray quotes) in the input from being parsed
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text.lower()))
+
+TOPIC_HITS = """
+    WITH hits AS (SELECT rowid FROM video_search WHERE video_search MATCH ?)
+    SELECT {columns}
+    FROM hits
+    JOIN videos v ON v.rowid = hits.rowid
+    JOIN video_observations o ON o.video_key = v.video_key
+"""
+
+def search_topic_channels(text, limit=TOPIC_SEARCH_CHANNELS, conn=None):
+    # channels with stored videos whose title or tags match, most viral first
+    import pandas as pd
+    query = fts_query(text)
+    columns = """COALESCE(c.title, v.channel_id) AS channel_title, COUNT(DISTINCT v.video_key) AS videos,
+                 COUNT(DISTINCT o.run_id) AS runs, MAX(o.virality) AS virality_max, AVG(o.virality) AS virality_mean,
+                 MAX(o.views) AS views_max, MAX(o.saved_at) AS last_seen"""
+    with reading(conn) as conn:
+        return pd.read_sql_query(TOPIC_HITS.format(columns=columns) + """
+            LEFT JOIN channels c ON c.channel_id = v.channel_id
+            WHERE v.channel_id IS NOT NULL
+            GROUP BY v.channel_id ORDER BY virality_max DESC, videos DESC LIMIT ?
+        """, conn, params=(query or '""', limit), parse_dates=["last_seen"])
+
+def search_topic_history(text, conn=None):
+    # per saved run: how many matching videos it observed and how viral they were
+    import pandas as pd
+    query = fts_query(text)
+    columns = """r.started_at, COUNT(DISTINCT o.video_key) AS videos, COUNT(DISTINCT v.channel_id) AS channels,
+                 AVG(o.virality) AS virality, MAX(o.virality) AS virality_max, SUM(o.views) AS views"""
+    with reading(conn) as conn:
+        return pd.read_sql_query(TOPIC_HITS.format(columns=columns) + """
+            JOIN runs r ON r.run_id = o.run_id
+            GROUP BY o.run_id ORDER BY r.started_at
+        """, conn, params=(query or '""',), parse_dates=["started_at"])
+
+def load_rising_topics(recent_runs=TOPIC_RECENT_RUNS, limit=TOPIC_SUGGESTIONS, conn=None):
+    # phrases whose share of the last `recent_runs` runs most exceeds their share of every
+    # earlier run; reads the recent runs' counts and the totals, never the samples
+    with reading(conn) as conn:
+        runs = conn.execute("SELECT run_id, topic_weight FROM runs WHERE topic_weight > 0 ORDER BY started_at DESC").fetchall()
+        recent = runs[:recent_runs]
+        recent_weight = sum(weight for _, weight in recent)
+        baseline_weight = sum(weight for _, weight in runs[recent_runs:])
+        if not recent or not baseline_weight:
+            return []
+        rows = conn.execute(f"""
+            SELECT r.phrase, r.weight, r.videos, tot.weight FROM (
+                SELECT phrase, SUM(weight) AS weight, SUM(videos) AS videos FROM run_topics
+                WHERE run_id IN ({",".join("?" * len(recent))}) GROUP BY phrase HAVING SUM(videos) >= ?
+            ) r JOIN topic_totals tot ON tot.phrase = r.phrase
+        """, [run_id for run_id, _ in recent] + [TOPIC_MIN_VIDEOS]).fetchall()
+    return rank_rising(rows, recent_weight, baseline_weight, limit)
+
+# -------------------------
+# Channel watchlist (channel_stats time series)
+# -------------------------
+def add_to_watchlist(channel_ids, now=None):
+    added_at = (now or datetime.utcnow()).isoformat()
+    conn = connect()
+    with conn:
+        before = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO channel_watchlist(channel_id, added_at) VALUES (?, ?)",
+                         [(cid, added_at) for cid in dict.fromkeys(channel_ids) if cid])
+        added = conn.total_changes - before
+        bump_data_version(conn)
+    conn.close()
+    return added
+
+def remove_from_watchlist(channel_ids):
+    # the polled history stays; channels watched again continue their series
+    conn = connect()
+    with conn:
+        before = conn.total_changes
+        conn.executemany("DELETE FROM channel_watchlist WHERE channel_id = ?", [(cid,) for cid in channel_ids])
+        removed = conn.total_changes - before
+        bump_data_version(conn)
+    conn.close()
+    return removed
+
+def load_watchlist_ids(conn=None):
+    with reading(conn) as conn:
+        return [row[0] for row in conn.execute("SELECT channel_id FROM channel_watchlist ORDER BY added_at, channel_id")]
+
+def load_watchlist(conn=None):
+    # (channel_id, title, latest polled subs, latest poll time) per watched channel
+    with reading(conn) as conn:
+        rows = conn.execute("""
+            SELECT w.channel_id, COALESCE(c.title, w.channel_id), s.subs, s.polled_at
+            FROM channel_watchlist w
+            LEFT JOIN channels c ON c.channel_id = w.channel_id
+            LEFT JOIN channel_stats s ON s.channel_id = w.channel_id
+                 AND s.polled_at = (SELECT MAX(polled_at) FROM channel_stats WHERE channel_id = w.channel_id)
+            ORDER BY w.added_at, w.channel_id
+        """).fetchall()
+    return [(cid, title, subs, datetime.utcfromtimestamp(ts) if ts is not None else None) for cid, title, subs, ts in rows]
+
+def load_top_history_channels(limit, conn=None):
+    # channels from saved runs, most viral first: watchlist seeds
+    with reading(conn) as conn:
+        return [row[0] for row in conn.execute("""
+            SELECT channel_id FROM channel_run_rollups GROUP BY channel_id
+            ORDER BY MAX(virality_max) DESC, MAX(views) DESC LIMIT ?
+        """, (limit,))]
+
+def save_channel_stats(channel_items, polled_at, missing=0, quota_units=0):
+    # one channel_stats row per returned channel, plus the refresh's own row
+    ts = int(polled_at.replace(tzinfo=timezone.utc).timestamp())
+    rows = []
+    for ch in channel_items:
+        stats = ch.get("statistics", {})
+        # hidden subscriber counts are missing from the response, not zero
+        subs = None if stats.get("hiddenSubscriberCount") or "subscriberCount" not in stats else safe_int(stats["subscriberCount"])
+        rows.append((ch.get("id"), ts, subs, safe_int(stats.get("viewCount", 0)), safe_int(stats.get("videoCount", 0))))
+    conn = connect()
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO channel_stats(channel_id, polled_at, subs, views, videos) VALUES (?,?,?,?,?)", rows)
+        conn.execute("INSERT OR REPLACE INTO watchlist_polls(polled_at, channels, missing, quota_units) VALUES (?,?,?,?)",
+                     (polled_at.isoformat(), len(rows), missing, quota_units))
+        bump_data_version(conn)
+    conn.close()
+
+def load_subscriber_series(channel_id, conn=None):
+    # subscriber counts over time: watchlist polls, plus the counts saved with scan runs
+    import pandas as pd
+    with reading(conn) as conn:
+        return pd.read_sql_query("""
+            SELECT strftime('%Y-%m-%dT%H:%M:%S', polled_at, 'unixepoch') AS at, subs FROM channel_stats
+            WHERE channel_id = ? AND subs IS NOT NULL
+            UNION ALL
+            SELECT substr(saved_at, 1, 19), subs FROM channel_run_rollups WHERE channel_id = ? AND subs IS NOT NULL
+            ORDER BY at
+        """, conn, params=(channel_id, channel_id), parse_dates=["at"])
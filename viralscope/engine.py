@@ -0,0 +1,742 @@
+# viralscope/engine.py
+"""Headless scan engine: fetch, score, aggregate channels and save, with no Streamlit dependency."""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import heapq
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Union
+
+from . import db
+from .export import COLUMNAR_FORMATS, EXPORT_DIR, CsvExport, DatasetExport, columnar_available
+from .metrics import StageTimer, append_metrics_log, build_profile
+from .api import (
+    API_BATCH_SIZE, API_KEYS, DEFAULT_DAILY_QUOTA, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_SCAN_CONCURRENCY,
+    MAX_SCAN_CONCURRENCY, SEARCH_PAGE_SIZE, QuotaBudgetExceeded, QuotaLedger, YouTubeAPIError, YouTubeClient,
+    estimate_scan_quota, make_http_session, plan_scan_budget,
+)
+try:
+    from . import scoring  # pandas/NumPy batch path for large scans
+except ImportError:
+    scoring = None
+from .utils import (
+    chunked, compute_virality_score, monetization_likelihood, parse_iso8601_duration_to_seconds,
+    parse_rfc3339_to_datetime, safe_int, seconds_to_readable, video_key,
+)
+
+# -------------------------
+# Rows
+# -------------------------
+SAMPLE_VIDEOS_PER_CARD = 10  # the card keeps the channel's most viewed videos; aggregates use all of them
+
+class VideoRow:
+    """One scanned video. A deep scan holds hundreds of thousands of these, and the same
+    object serves as channel sample, DB row and CSV row, so it uses slots rather than a
+    dict. It reads and writes like a mapping over FIELDS, as the dict rows did; url and
+    duration_readable are derived on access and the raw video id is not one of the keys."""
+
+    FIELDS = ("video_key", "keyword", "title", "url", "views", "likes", "comments", "duration_seconds",
+              "duration_readable", "channel_id", "channel_title", "channel_subs", "thumbnail", "published_at",
+              "virality", "monetization_likelihood", "tags", "from_history")
+    __slots__ = ("video_id",) + tuple(f for f in FIELDS if f not in ("url", "duration_readable"))
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    @property
+    def url(self):
+        return f"https://www.youtube.com/watch?v={self.video_id}" if self.video_id else None
+
+    @property
+    def duration_readable(self):
+        return seconds_to_readable(self.duration_seconds)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, (VideoRow, dict)):
+            return all(self.get(name) == other.get(name) for name in self.FIELDS)
+        return NotImplemented
+
+    def keys(self):
+        return self.FIELDS
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.FIELDS]
+
+    def as_dict(self, fields=FIELDS):
+        return {name: getattr(self, name) for name in fields}
+
+def compact_search_item(it):
+    # all the scan reads from a search hit; snippets carry descriptions and three thumbnails
+    snip = it.get("snippet", {})
+    return {"id": {"videoId": it.get("id", {}).get("videoId")},
+            "snippet": {"channelId": snip.get("channelId"), "channelTitle": snip.get("channelTitle")}}
+
+def compact_video_item(vi):
+    # the parts of a videos.list item the scan reads; the description, localizations
+    # and the other thumbnail sizes are most of its size and are never used
+    snip = vi.get("snippet", {})
+    thumbs = snip.get("thumbnails", {})
+    thumb = (thumbs.get("medium") or thumbs.get("high") or thumbs.get("default") or {}).get("url")
+    stats = vi.get("statistics", {})
+    compact = {
+        "id": vi.get("id"),
+        "snippet": {"publishedAt": snip.get("publishedAt"), "channelId": snip.get("channelId"), "title": snip.get("title", ""),
+                    "channelTitle": snip.get("channelTitle"), "thumbnails": {"medium": {"url": thumb}} if thumb else {},
+                    "tags": snip.get("tags") or []},
+        "statistics": {k: stats[k] for k in ("viewCount", "likeCount", "commentCount") if k in stats},
+    }
+    if "duration" in vi.get("contentDetails", {}):
+        compact["contentDetails"] = {"duration": vi["contentDetails"]["duration"]}
+    return compact
+
+# -------------------------
+# Fetch (concurrent paged search + enrichment, then batched channels)
+# -------------------------
+def iter_search_pages(client, kw, published_after, max_results):
+    # lazy: the next page is only requested when the consumer asks for it, so a
+    # caller that stops iterating stops spending search quota
+    fetched = 0
+    page_token = None
+    while fetched < max_results:
+        search_params = {
+            "part": "snippet",
+            "q": kw,
+            "type": "video",
+            "order": "viewCount",
+            "publishedAfter": published_after,
+            "maxResults": min(SEARCH_PAGE_SIZE, max_results - fetched)
+        }
+        if page_token:
+            search_params["pageToken"] = page_token
+        r = client.get("search", search_params, keyword=kw)
+        if r.status_code != 200:
+            raise YouTubeAPIError(f"Search API error for '{kw}': {r.status_code} {r.text}")
+        data = r.json()
+        items = [compact_search_item(it) for it in data.get("items", [])]
+        fetched += len(items)
+        yield items
+        page_token = data.get("nextPageToken")
+        if not items or not page_token:
+            return
+
+def fetch_by_ids(client, stage, part, ids, keyword=None):
+    # runs on a worker thread: one videos.list / channels.list call for up to 50 ids
+    label = stage.capitalize()
+    try:
+        resp = client.get(stage, {"part": part, "id": ",".join(ids)}, keyword=keyword)
+    except (YouTubeAPIError, QuotaBudgetExceeded) as err:
+        return [], str(err)
+    if resp.status_code != 200:
+        return [], f"{label} API error ({len(ids)} ids): {resp.status_code} {resp.text}"
+    return resp.json().get("items", []), None
+
+class VideoStore:
+    """Thread-safe video_id -> compacted videos.list item map; each id is fetched once per scan."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._claimed = set()
+        self._items = {}
+
+    def claim(self, video_ids):
+        with self._lock:
+            fresh = [vid for vid in dict.fromkeys(video_ids) if vid not in self._claimed]
+            self._claimed.update(fresh)
+        return fresh
+
+    def add(self, video_items):
+        with self._lock:
+            for vi in video_items:
+                self._items[vi.get("id")] = compact_video_item(vi)
+
+    def get(self, video_id):
+        with self._lock:
+            return self._items.get(video_id)
+
+def enrich_page(client, store, video_ids, keyword=None):
+    # videos.list for the ids on one search page that no other keyword has fetched yet
+    fresh = store.claim(video_ids)
+    if not fresh:
+        return None
+    items, err = fetch_by_ids(client, "videos", "snippet,statistics,contentDetails", fresh, keyword=keyword)
+    store.add(items)
+    return err
+
+def page_below_threshold(store, video_ids, now, min_views=0, min_virality=0):
+    # search is ordered by viewCount, so once the best video on a page misses the
+    # bar the long tail on later pages will too; ids still in flight elsewhere are skipped
+    if not min_views and not min_virality:
+        return False
+    known = [store.get(vid) for vid in video_ids]
+    known = [vi for vi in known if vi]
+    if not known:
+        return False
+    best_views = 0
+    best_virality = 0
+    for vi in known:
+        views = safe_int(vi.get("statistics", {}).get("viewCount", 0))
+        published = parse_rfc3339_to_datetime(vi.get("snippet", {}).get("publishedAt"))
+        best_views = max(best_views, views)
+        best_virality = max(best_virality, compute_virality_score(views, published, now=now))
+    if min_views and best_views < min_views:
+        return True
+    if min_virality and best_virality < min_virality:
+        return True
+    return False
+
+def search_keyword(client, enrich_pool, store, kw, published_after, max_results, now, min_views=0, min_virality=0):
+    # runs on a worker thread: network only, no Streamlit calls. Page n is enriched
+    # on enrich_pool while page n+1 downloads; page n's threshold check happens
+    # before page n+2 is requested, so at most one page past the cut-off is fetched
+    result = {"keyword": kw, "items": [], "errors": [], "pages": 0, "stopped_early": False}
+    enrichments = []
+    try:
+        for items in iter_search_pages(client, kw, published_after, max_results):
+            result["items"].extend(items)
+            result["pages"] += 1
+            ids = [it.get("id", {}).get("videoId") for it in items]
+            ids = [vid for vid in ids if vid]
+            enrichments.append((enrich_pool.submit(enrich_page, client, store, ids, kw), ids))
+            if len(enrichments) >= 2:
+                prev_fut, prev_ids = enrichments[-2]
+                prev_fut.result()
+                if page_below_threshold(store, prev_ids, now, min_views, min_virality):
+                    result["stopped_early"] = True
+                    break
+    except (YouTubeAPIError, QuotaBudgetExceeded) as err:
+        result["errors"].append(str(err))
+    for fut, _ in enrichments:
+        err = fut.result()
+        if err:
+            result["errors"].append(err)
+    return result
+
+def collect_search_hits(search_results):
+    # video_id -> every keyword that found it (in keyword order), plus channel seeds
+    vid_keywords = {}
+    channel_seeds = {}
+    for result in search_results:
+        kw = result["keyword"]
+        for it in result["items"]:
+            vid = it.get("id", {}).get("videoId")
+            if not vid:
+                continue
+            kws = vid_keywords.setdefault(vid, [])
+            if kw not in kws:
+                kws.append(kw)
+            cid = it.get("snippet", {}).get("channelId")
+            if cid and not channel_seeds.get(cid):
+                channel_seeds[cid] = it.get("snippet", {}).get("channelTitle")
+    return vid_keywords, channel_seeds
+
+def merge_channel_items(channel_items, channel_map):
+    for ch in channel_items:
+        cid = ch.get("id")
+        subs = safe_int(ch.get("statistics", {}).get("subscriberCount", 0))
+        published_at = ch.get("snippet", {}).get("publishedAt")
+        country = ch.get("snippet", {}).get("country")
+        avatar = ch.get("snippet", {}).get("thumbnails", {}).get("default", {}).get("url")
+        title = ch.get("snippet", {}).get("title")
+        channel_map.setdefault(cid, {"title": title, "subs": subs, "published_at": published_at, "country": country, "avatar": avatar, "sample_videos": []})
+        channel_map[cid]["title"] = channel_map[cid].get("title") or title
+        channel_map[cid]["subs"] = channel_map[cid].get("subs") or subs
+        channel_map[cid]["published_at"] = channel_map[cid].get("published_at") or published_at
+        channel_map[cid]["country"] = channel_map[cid].get("country") or country
+        channel_map[cid]["avatar"] = channel_map[cid].get("avatar") or avatar
+
+def use_batch_scoring(n_rows):
+    return scoring is not None and n_rows >= scoring.BATCH_SCORING_MIN_ROWS
+
+def merge_video_items(video_items, vid_keywords, channel_map, all_video_rows, now):
+    # deep scans parse and score every item in one columnar pass; the result is
+    # identical to the per-item scalar functions
+    batch = scoring.video_frame(video_items, now) if use_batch_scoring(len(video_items)) else None
+    if batch is not None:
+        b_views, b_likes, b_comments = batch["views"].tolist(), batch["likes"].tolist(), batch["comments"].tolist()
+        b_duration, b_virality, b_published = batch["duration_seconds"].tolist(), batch["virality"].tolist(), batch["published_at"].tolist()
+    for i, vi in enumerate(video_items):
+        vid = vi.get("id")
+        if isinstance(vid, dict):
+            vid = vid.get("videoId") or vid.get("id")
+        snip = vi.get("snippet", {})
+        cid = snip.get("channelId")
+        title = snip.get("title", "")
+        if batch is not None:
+            views, likes, comments = b_views[i], b_likes[i], b_comments[i]
+            duration_s, virality, published_iso = b_duration[i], b_virality[i], b_published[i]
+        else:
+            publish_dt = parse_rfc3339_to_datetime(snip.get("publishedAt"))
+            stats = vi.get("statistics", {})
+            views = safe_int(stats.get("viewCount", 0))
+            likes = safe_int(stats.get("likeCount", 0))
+            comments = safe_int(stats.get("commentCount", 0))
+            duration_s = parse_iso8601_duration_to_seconds(vi.get("contentDetails", {}).get("duration", "PT0S"))
+            virality = compute_virality_score(views, publish_dt, now=now)
+            published_iso = publish_dt.isoformat() if publish_dt else None
+        thumbs = snip.get("thumbnails", {})
+        thumbnail = (thumbs.get("medium") or thumbs.get("high") or thumbs.get("default") or {}).get("url")
+        ch_title = None
+        if cid and cid in channel_map and channel_map[cid].get("title"):
+            ch_title = channel_map[cid]["title"]
+        else:
+            ch_title = snip.get("channelTitle")
+        if cid and cid not in channel_map:
+            channel_map[cid] = {"title": ch_title, "subs": None, "published_at": None, "country": None, "avatar": None, "sample_videos": []}
+
+        row = VideoRow(
+            video_id=vid,
+            video_key=video_key(vid),
+            keyword=",".join(vid_keywords.get(vid, [])),
+            title=title,
+            views=views,
+            likes=likes,
+            comments=comments,
+            duration_seconds=duration_s,
+            channel_id=cid,
+            channel_title=ch_title,
+            channel_subs=channel_map.get(cid, {}).get("subs"),
+            thumbnail=thumbnail,
+            published_at=published_iso,
+            virality=virality,
+            tags=",".join(snip.get("tags") or []),
+        )
+        all_video_rows.append(row)
+        if cid:
+            channel_map[cid].setdefault("sample_videos", [])
+            channel_map[cid]["sample_videos"].append(row)
+
+def merge_cached_channels(cached, channel_map):
+    for cid, info in cached.items():
+        entry = channel_map.setdefault(cid, {"title": None, "subs": None, "published_at": None, "country": None, "avatar": None, "sample_videos": []})
+        for field in ("title", "subs", "published_at", "country", "avatar"):
+            entry[field] = entry.get(field) or info.get(field)
+
+def merge_history_rows(history_rows, channel_map, all_video_rows):
+    # stored rows fill in the part of the window that was not searched again; a video the
+    # new search found as well keeps its fresh row
+    seen = {(r.channel_id, r.title, r.published_at) for r in all_video_rows}
+    for stored in history_rows:
+        if (stored["channel_id"], stored["title"], stored["published_at"]) in seen:
+            continue
+        row = VideoRow(**stored)
+        cid = row.channel_id
+        if cid and cid in channel_map:
+            row["channel_subs"] = channel_map[cid].get("subs") or row["channel_subs"]
+            channel_map[cid]["sample_videos"].append(row)
+        all_video_rows.append(row)
+
+def keyword_windows(keywords, published_after, window_start=None):
+    # incremental: each keyword searches only since its watermark, and stored rows from
+    # the rest of the window are merged back in; returns (since, history_rows)
+    since = {kw: published_after for kw in keywords}
+    if not window_start:
+        return since, []
+    for kw, mark in db.load_keyword_watermarks(keywords).items():
+        mark_dt = parse_rfc3339_to_datetime(mark)
+        if mark_dt and mark_dt > window_start:
+            since[kw] = mark_dt.isoformat("T") + "Z"
+    return since, db.load_history_rows(keywords, window_start)
+
+def search_phase(client, keywords, since, depth, now, concurrency, min_views=0, min_virality=0,
+                 on_progress=None, resume=None, on_keyword_done=None):
+    # phase one: page through every keyword's search at once (up to `concurrency`),
+    # enriching each page's new videos as it arrives. Network only, no DB access.
+    # on_keyword_done(search_result, video_items) fires as each keyword finishes cleanly;
+    # resume maps keyword -> {"search": ..., "videos": ...} saved from it by an earlier
+    # attempt, and those keywords are not searched again
+    store = VideoStore()
+    errors = []
+    resumed = {kw: cp for kw, cp in (resume or {}).items() if kw in depth}
+    for cp in resumed.values():
+        store.claim([vi.get("id") for vi in cp["videos"]])
+        store.add(cp["videos"])
+    with ThreadPoolExecutor(max_workers=concurrency) as pool, ThreadPoolExecutor(max_workers=concurrency) as enrich_pool:
+        # ids a checkpointed keyword found but another keyword was still enriching
+        missing = [it.get("id", {}).get("videoId") for cp in resumed.values() for it in cp["search"]["items"]]
+        refill = [enrich_pool.submit(enrich_page, client, store, batch) for batch in chunked(store.claim([vid for vid in missing if vid]), API_BATCH_SIZE)]
+        futures = {kw: pool.submit(search_keyword, client, enrich_pool, store, kw, since[kw], depth[kw], now, min_views, min_virality)
+                   for kw in keywords if kw not in resumed}
+        for done, fut in enumerate(as_completed(futures.values()), start=len(resumed) + 1):
+            result = fut.result()
+            if on_keyword_done and not result["errors"]:
+                ids = [it.get("id", {}).get("videoId") for it in result["items"]]
+                on_keyword_done(result, [vi for vi in map(store.get, ids) if vi])
+            if on_progress:
+                on_progress(done, len(keywords), f"search: {result['keyword']}")
+        for fut in refill:
+            err = fut.result()
+            if err:
+                errors.append(err)
+    search_results = [resumed[kw]["search"] if kw in resumed else futures[kw].result() for kw in keywords]
+    for result in search_results:
+        errors.extend(result["errors"])
+    return search_results, store, errors
+
+def channel_phase(client, channel_seeds, subs_ttl_hours, now, concurrency, on_progress=None):
+    # phase two: each distinct channel is looked up once, from the cache when every field
+    # is fresh, otherwise in full 50-id channels.list batches; returns (channel_map, errors, stats)
+    channel_map = {cid: {"title": title, "subs": None, "published_at": None, "country": None, "avatar": None, "sample_videos": []}
+                   for cid, title in channel_seeds.items()}
+    cached_channels = db.load_cached_channels(channel_seeds, subs_ttl_hours, now)
+    channel_ids = [cid for cid in channel_seeds if cid not in cached_channels]
+    stats = {"channel_cache_hits": len(cached_channels), "channel_cache_misses": len(channel_ids)}
+    merge_cached_channels(cached_channels, channel_map)
+    errors = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        channel_futures = [pool.submit(fetch_by_ids, client, "channels", "snippet,statistics", batch)
+                           for batch in chunked(channel_ids, API_BATCH_SIZE)]
+        for done, fut in enumerate(as_completed(channel_futures), start=1):
+            if on_progress:
+                on_progress(done, len(channel_futures), "channel batches")
+    for fut in channel_futures:
+        items, err = fut.result()
+        if err:
+            errors.append(err)
+        merge_channel_items(items, channel_map)
+        db.save_channels_to_cache(items, now)
+    return channel_map, errors, stats
+
+def merge_scan_results(search_results, store, history_rows, channel_map, now):
+    # videos (fresh, then stored history) into channel_map; returns (all_video_rows, stats)
+    vid_keywords, _ = collect_search_hits(search_results)
+    all_video_rows = []
+    video_items = [store.get(vid) for vid in vid_keywords]
+    merge_video_items([vi for vi in video_items if vi], vid_keywords, channel_map, all_video_rows, now)
+    if history_rows:
+        merge_history_rows(history_rows, channel_map, all_video_rows)
+    # keywords whose search finished cleanly may advance their watermark when the run is saved
+    failed = {result["keyword"] for result in search_results if result["errors"]}
+    stats = {
+        "search_pages": sum(result["pages"] for result in search_results),
+        "keywords_stopped_early": sum(1 for result in search_results if result["stopped_early"]),
+        "history_rows": len(history_rows),
+        "watermarks": {result["keyword"]: now.isoformat() for result in search_results if result["keyword"] not in failed},
+    }
+    return all_video_rows, stats
+
+def history_channel_seeds(search_results, history_rows):
+    _, channel_seeds = collect_search_hits(search_results)
+    for row in history_rows:
+        if row["channel_id"] and not channel_seeds.get(row["channel_id"]):
+            channel_seeds[row["channel_id"]] = row["channel_title"]
+    return channel_seeds
+
+def run_keyword_scan(keywords, published_after, max_results, now, concurrency=DEFAULT_SCAN_CONCURRENCY, on_progress=None,
+                     subs_ttl_hours=db.CHANNEL_SUBS_TTL_HOURS, min_views=0, min_virality=0, quota_budget=None,
+                     requests_per_second=DEFAULT_REQUESTS_PER_SECOND, api_keys=None, cache_mode="off",
+                     incremental=False, window_start=None, resume=None, on_keyword_done=None, timer=None):
+    # search_phase for every keyword, then channel_phase for the channels they found.
+    # max_results is either one depth for all keywords or a per-keyword dict from
+    # plan_scan_budget; see search_phase for resume/on_keyword_done
+    timer = timer or StageTimer()
+    concurrency = max(1, min(int(concurrency), MAX_SCAN_CONCURRENCY))
+    ledger = QuotaLedger(budget=quota_budget)
+    # search workers + enrichment workers share the keep-alive pool
+    client = YouTubeClient(make_http_session(concurrency * 2), ledger, api_keys=api_keys,
+                           requests_per_second=requests_per_second, cache_mode=cache_mode)
+    depth = max_results if isinstance(max_results, dict) else {kw: max_results for kw in keywords}
+    keywords = [kw for kw in keywords if depth.get(kw)]
+    since, history_rows = keyword_windows(keywords, published_after, window_start if incremental else None)
+    try:
+        # video enrichment overlaps the search pages, so its time is inside "search"
+        with timer.stage("search"):
+            search_results, store, errors = search_phase(client, keywords, since, depth, now, concurrency, min_views, min_virality,
+                                                         on_progress=on_progress, resume=resume, on_keyword_done=on_keyword_done)
+        channel_seeds = history_channel_seeds(search_results, history_rows)
+        with timer.stage("channels"):
+            channel_map, channel_errors, scan_stats = channel_phase(client, channel_seeds, subs_ttl_hours, now, concurrency, on_progress)
+    finally:
+        client.close()
+        db.record_quota_spend(now, ledger.total)
+    timer.add("search", rows=sum(len(result["items"]) for result in search_results))
+    timer.add("channels", rows=len(channel_map))
+    errors.extend(channel_errors)
+    scan_stats["quota"] = ledger.snapshot()
+    scan_stats.update(client.stats)
+    scan_stats["api"] = client.endpoint_stats()
+    if incremental and window_start:
+        scan_stats["keywords_incremental"] = sum(1 for kw in keywords if since[kw] != published_after)
+    with timer.stage("scoring"):
+        all_video_rows, merge_stats = merge_scan_results(search_results, store, history_rows, channel_map, now)
+    timer.add("scoring", rows=len(all_video_rows))
+    scan_stats.update(merge_stats)
+    return channel_map, all_video_rows, errors, scan_stats
+
+# -------------------------
+# Channel aggregation + outputs
+# -------------------------
+def build_channel_cards(channel_map, now, min_channel_subs=0, max_channel_age_months=0,
+                        include_unknown_channel_age=True, only_shorts=False, country_filter=""):
+    # build channel cards with filters (max_channel_age_months means channels created in last X months)
+    n_rows = sum(len(cinfo.get("sample_videos", [])) for cinfo in channel_map.values())
+    batch = use_batch_scoring(n_rows)
+    aggregates = scoring.channel_aggregates(channel_map) if batch else {}
+    channel_cards = []
+    for cid, cinfo in channel_map.items():
+        sv = cinfo.get("sample_videos", [])
+        if not sv:
+            continue
+
+        # country filter
+        ch_country = cinfo.get("country")
+        if country_filter:
+            cf = country_filter.strip().lower()
+            if ch_country:
+                if cf not in str(ch_country).lower():
+                    continue
+            else:
+                continue
+
+        if batch:
+            agg = aggregates[cid]
+            sample_count = agg["sample_count"]
+            avg_duration = agg["avg_duration"]
+            avg_views_sample = agg["avg_views_sample"]
+        else:
+            sample_count = len(sv)
+            avg_duration = sum(v["duration_seconds"] for v in sv) / sample_count
+            avg_views_sample = sum(v["views"] for v in sv) / sample_count
+        published_raw = cinfo.get("published_at")
+        ch_published_dt = parse_rfc3339_to_datetime(published_raw) if published_raw else None
+        if ch_published_dt:
+            ch_age_months = max(0, (now.year - ch_published_dt.year) * 12 + (now.month - ch_published_dt.month))
+        else:
+            ch_age_months = None
+
+        # apply Max channel age filter meaning "channels created in the last X months"
+        if max_channel_age_months and max_channel_age_months > 0:
+            # if channel age unknown, include only if user allowed it
+            if ch_age_months is None:
+                if not include_unknown_channel_age:
+                    continue
+            else:
+                # include only if channel age is <= max_channel_age_months
+                if ch_age_months > max_channel_age_months:
+                    continue
+
+        if batch:
+            highest_virality = agg["highest_virality"]
+            median_virality = agg["median_virality"]
+        else:
+            virality_list = [v["virality"] for v in sv]
+            highest_virality = max(virality_list) if virality_list else 0
+            median_virality = int(sorted(virality_list)[len(virality_list)//2]) if virality_list else 0
+        subs = cinfo.get("subs") or 0
+        ch_title = cinfo.get("title") or (sv[0].get("channel_title") if sv and sv[0].get("channel_title") else cid)
+        card = {
+            "channel_id": cid,
+            "channel_title": ch_title,
+            "subs": subs,
+            "channel_age_months": ch_age_months,
+            "country": cinfo.get("country"),
+            "avatar": cinfo.get("avatar"),
+            "avg_duration_seconds": avg_duration,
+            "avg_duration_readable": seconds_to_readable(avg_duration),
+            "sample_count": sample_count,
+            "avg_views_sample": int(avg_views_sample),
+            "highest_virality": highest_virality,
+            "median_virality": median_virality,
+            "monetization_likelihood": None,
+            # nlargest keeps sorted()'s order, ties included, without sorting every video
+            "sample_videos": heapq.nlargest(SAMPLE_VIDEOS_PER_CARD, sv, key=lambda x: x["views"]),
+        }
+        if min_channel_subs and card["subs"] < min_channel_subs:
+            continue
+        if only_shorts and card["avg_duration_seconds"] >= 60:
+            continue
+        # monetization needs the unrounded sample average
+        card["_avg_views"] = avg_views_sample
+        channel_cards.append(card)
+
+    if batch and channel_cards:
+        monets = scoring.monetization_scores([c["subs"] for c in channel_cards], [c["_avg_views"] for c in channel_cards],
+                                             [c["channel_age_months"] for c in channel_cards]).tolist()
+    else:
+        monets = [monetization_likelihood(c["subs"], c["_avg_views"], c["channel_age_months"]) for c in channel_cards]
+    for card, monet in zip(channel_cards, monets):
+        del card["_avg_views"]
+        card["monetization_likelihood"] = monet
+        for v in channel_map[card["channel_id"]]["sample_videos"]:
+            v["monetization_likelihood"] = monet
+            v["channel_title"] = card["channel_title"]
+            v["channel_subs"] = v["channel_subs"] or card["subs"]
+
+    # sort channels by virality
+    return sorted(channel_cards, key=lambda x: x["highest_virality"], reverse=True)
+
+def build_output_rows(channel_cards, channel_map):
+    # every video of the channels that made a card, in card order; DB and CSV rows are the
+    # same VideoRow objects (the exports and result_payload leave out channel_id)
+    rows = [row for c in channel_cards for row in channel_map[c["channel_id"]]["sample_videos"]]
+    return rows, rows
+
+def export_rows(config, channel_cards, channel_map, run_id, now):
+    # writes each card's rows to the CSV and/or columnar dataset; returns (csv file, dataset files).
+    # Runs after the cards are built, not as fetches finish: the rows are the cards' samples
+    exports = []
+    if config.save_csv:
+        exports.append(CsvExport(config.csv_dir))
+    if config.export_format:
+        exports.append(DatasetExport(config.export_dir, config.export_format, run_id, now))
+    for card in channel_cards:
+        rows = channel_map[card["channel_id"]]["sample_videos"]
+        for export in exports:
+            export.write(rows)
+    files = [export.close() for export in exports]
+    csv_file = files.pop(0)[0] if config.save_csv else None
+    return csv_file, files[0] if files else []
+
+# -------------------------
+# Typed entry point
+# -------------------------
+@dataclass
+class ScanConfig:
+    keywords: List[str]
+    days: int = 7
+    results_per_keyword: int = 8
+    min_channel_subs: int = 0
+    max_channel_age_months: int = 0
+    include_unknown_channel_age: bool = True
+    only_shorts: bool = False
+    country_filter: str = ""
+    concurrency: int = DEFAULT_SCAN_CONCURRENCY
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND
+    api_keys: List[str] = field(default_factory=lambda: list(API_KEYS))
+    subs_ttl_hours: int = db.CHANNEL_SUBS_TTL_HOURS
+    stop_below_views: int = 0
+    stop_below_virality: int = 0
+    daily_quota_budget: Optional[int] = DEFAULT_DAILY_QUOTA  # None = no budget
+    fit_to_budget: bool = True
+    cache_mode: str = "off"
+    incremental: bool = False
+    notes: str = ""
+    save_csv: bool = True
+    csv_dir: str = "."
+    export_format: Optional[str] = None  # "parquet" or "arrow": also write a partitioned dataset to export_dir
+    export_dir: str = EXPORT_DIR
+    save_to_db: bool = True
+    metrics_log: Optional[str] = None  # append one JSON line of run metrics to this file
+
+    def __post_init__(self):
+        # fail before any quota is spent rather than after the scan
+        if self.export_format and self.export_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown export format '{self.export_format}' (expected one of: {', '.join(COLUMNAR_FORMATS)})")
+        if self.export_format and not columnar_available():
+            raise ValueError(f"{self.export_format} export needs pyarrow (pip install pyarrow)")
+
+@dataclass
+class ScanResult:
+    started_at: datetime
+    keywords: List[str]
+    channel_cards: List[dict] = field(default_factory=list)
+    db_rows: List[VideoRow] = field(default_factory=list)
+    csv_rows: List[VideoRow] = field(default_factory=list)  # the db_rows objects; see CSV_COLUMNS
+    errors: List[str] = field(default_factory=list)
+    notices: List[str] = field(default_factory=list)
+    stats: Dict[str, object] = field(default_factory=dict)
+    run_id: Optional[str] = None  # set when the run was saved to the DB
+    csv_file: Optional[str] = None
+    export_files: List[str] = field(default_factory=list)  # Parquet / Arrow part files written by this run
+    metrics: Dict[str, object] = field(default_factory=dict)  # see metrics.build_profile
+
+ProgressCallback = Callable[[int, int, str], None]
+
+def run_scan(config: ScanConfig, on_progress: Optional[ProgressCallback] = None, now: Optional[datetime] = None,
+             resume: Optional[Dict[str, dict]] = None, on_keyword_done: Optional[Callable[[dict, List[dict]], None]] = None,
+             timer: Optional[StageTimer] = None) -> ScanResult:
+    started = time.perf_counter()
+    timer = timer or StageTimer()
+    db.ensure_db()
+    now = now or datetime.utcnow()
+    result = ScanResult(started_at=now, keywords=list(config.keywords))
+    window_start = now - timedelta(days=config.days)
+    published_after = window_start.isoformat("T") + "Z"
+
+    scan_depth, quota_budget, notice = fit_scan_to_budget(config, now)
+    if notice:
+        result.notices.append(notice)
+    if not scan_depth:
+        return result
+
+    channel_map, all_video_rows, errors, stats = run_keyword_scan(
+        config.keywords, published_after, scan_depth, now,
+        concurrency=config.concurrency, on_progress=on_progress,
+        subs_ttl_hours=config.subs_ttl_hours, min_views=config.stop_below_views, min_virality=config.stop_below_virality,
+        quota_budget=quota_budget, requests_per_second=config.requests_per_second, api_keys=config.api_keys,
+        cache_mode=config.cache_mode, incremental=config.incremental, window_start=window_start,
+        resume=resume, on_keyword_done=on_keyword_done, timer=timer)
+    result.errors.extend(errors)
+    result.stats = stats
+    finish_scan(config, result, channel_map, now, timer, started)
+    return result
+
+def fit_scan_to_budget(config: ScanConfig, now: datetime):
+    # (scan depth, quota budget, notice): shrink the scan to the quota left today
+    scan_depth: Union[int, Dict[str, int]] = config.results_per_keyword
+    if config.daily_quota_budget is None or not config.fit_to_budget:
+        return scan_depth, None, None
+    quota_budget = max(0, config.daily_quota_budget - db.load_quota_spent_today(now))
+    estimate = estimate_scan_quota(len(config.keywords), config.results_per_keyword)
+    if estimate["total"] <= quota_budget:
+        return scan_depth, quota_budget, None
+    plan = plan_scan_budget(config.keywords, config.results_per_keyword, quota_budget,
+                            db.load_keyword_yield(config.keywords))
+    notice = (f"Scan reduced to fit {quota_budget} remaining units (est. {plan['estimate']['total']})"
+              + (f"; skipped: {', '.join(plan['skipped'])}" if plan["skipped"] else ""))
+    return plan["max_results"], quota_budget, notice
+
+def finish_scan(config: ScanConfig, result: ScanResult, channel_map: dict, now: datetime,
+                timer: StageTimer, started: float) -> None:
+    # channel cards, output rows, CSV and the DB run for a scan whose stats are already set;
+    # started is the scan's time.perf_counter() start, for the metrics' wall time
+    with timer.stage("cards"):
+        result.channel_cards = build_channel_cards(
+            channel_map, now, min_channel_subs=config.min_channel_subs, max_channel_age_months=config.max_channel_age_months,
+            include_unknown_channel_age=config.include_unknown_channel_age, only_shorts=config.only_shorts,
+            country_filter=config.country_filter)
+        result.db_rows, result.csv_rows = build_output_rows(result.channel_cards, channel_map)
+    timer.add("cards", rows=len(result.channel_cards))
+
+    # exported rows carry the same run id as the DB run, so the two can be joined
+    run_id = uuid.uuid4().hex
+    if (config.save_csv or config.export_format) and result.csv_rows:
+        with timer.stage("export"):
+            result.csv_file, result.export_files = export_rows(config, result.channel_cards, channel_map, run_id, now)
+        timer.add("export", rows=len(result.csv_rows))
+    if config.save_to_db and result.db_rows:
+        result.run_id = run_id
+        with timer.stage("db_save"):
+            db.save_run_to_db(result.run_id, now, config.days, config.keywords, config.notes, result.db_rows,
+                              quota=result.stats["quota"], watermarks=result.stats["watermarks"])
+        timer.add("db_save", rows=len(result.db_rows))
+    result.metrics = build_profile(timer, result.stats.get("api", {}), time.perf_counter() - started)
+    if result.run_id:
+        db.save_run_metrics(result.run_id, result.metrics)
+    if config.metrics_log:
+        append_metrics_log(config.metrics_log, {
+            "run_id": result.run_id,
+            "keywords": len(config.keywords),
+            "results_per_keyword": config.results_per_keyword,
+            "channels": len(result.channel_cards),
+            "videos": len(result.db_rows),
+            "quota_units": result.stats.get("quota", {}).get("total", 0),
+            "metrics": result.metrics,
+        })
@@ -0,0 +1,163 @@
+# viralscope/export.py
+"""Run exports: the classic one-file CSV, and typed, compressed Parquet or Arrow IPC
+datasets partitioned by run date and keyword, for notebooks that scan many runs.
+
+Both are incremental writers: write(rows) for each channel, then close(). The dataset
+writer turns at most EXPORT_BATCH_ROWS rows into Arrow at a time. A scan only starts
+writing once its channel cards are built, after every fetch: which rows are exported,
+and their channel_subs, depend on the channel lookups and the card filters. What the
+writers bound is the export's own memory, not how early rows reach disk.
+
+    import pyarrow.compute as pc
+    from viralscope.export import open_dataset
+    table = open_dataset("exports").to_table(columns=["title", "views"], filter=pc.field("keyword") == "AITA Update")
+"""
+from datetime import datetime
+from urllib.parse import quote
+import csv
+import os
+import uuid
+
+try:
+    import pyarrow as pa  # Parquet / Arrow IPC export
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+CSV_COLUMNS = ("keyword", "title", "channel_title", "channel_subs", "views", "likes", "comments", "duration_seconds",
+               "thumbnail", "published_at", "virality", "monetization_likelihood")
+COLUMNAR_FORMATS = ("parquet", "arrow")
+EXPORT_DIR = "exports"
+EXPORT_COMPRESSION = "zstd"
+EXPORT_BATCH_ROWS = 50000  # buffered rows, over all partitions, that trigger writing part files
+
+def columnar_available():
+    return pa is not None
+
+# -------------------------
+# CSV
+# -------------------------
+class CsvExport:
+    """One CSV per run, rows appended as they come; channel_id is left out."""
+
+    def __init__(self, directory="."):
+        ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        self.path = os.path.join(directory, f"viral_scope_run_{ts}_{uuid.uuid4().hex[:6]}.csv")
+        self._file = open(self.path, "w", newline='', encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+        return [self.path]
+
+# -------------------------
+# Parquet / Arrow IPC datasets
+# -------------------------
+def export_schema():
+    # run_date and keyword are hive partition directories, not file columns; keywords
+    # lists every keyword that found the video, the partition is the first of them
+    return pa.schema([
+        ("run_id", pa.string()),
+        ("started_at", pa.timestamp("s", tz="UTC")),
+        ("video_key", pa.string()),
+        ("keywords", pa.list_(pa.string())),
+        ("title", pa.string()),
+        ("channel_title", pa.string()),
+        ("channel_subs", pa.int64()),
+        ("views", pa.int64()),
+        ("likes", pa.int64()),
+        ("comments", pa.int64()),
+        ("duration_seconds", pa.int32()),
+        ("thumbnail", pa.string()),
+        ("published_at", pa.timestamp("s", tz="UTC")),
+        ("virality", pa.int8()),
+        ("monetization_likelihood", pa.int8()),
+    ])
+
+def parse_published(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.rstrip("Z"))
+    except ValueError:
+        return None
+
+class DatasetExport:
+    """Writes rows into <directory>/run_date=YYYY-MM-DD/keyword=<kw>/part-<run_id>-<n>.<ext>."""
+
+    def __init__(self, directory, fmt, run_id, started_at, batch_rows=EXPORT_BATCH_ROWS):
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}' (expected one of: {', '.join(COLUMNAR_FORMATS)})")
+        if pa is None:
+            raise ValueError(f"{fmt} export needs pyarrow (pip install pyarrow)")
+        self.directory = directory
+        self.fmt = fmt
+        self.run_id = run_id
+        self.started_at = started_at.replace(microsecond=0)
+        self.batch_rows = batch_rows
+        self.schema = export_schema()
+        self.files = []
+        self._buffers = {}  # partition keyword -> rows not written yet
+        self._buffered = 0
+
+    def write(self, rows):
+        # rows an incremental scan merged back from history belong to the runs that observed
+        # them, and the DB leaves them out of this one too, so run ids still join
+        rows = [row for row in rows if not row.get("from_history")]
+        for row in rows:
+            self._buffers.setdefault((row.get("keyword") or "").split(",")[0], []).append(row)
+        self._buffered += len(rows)
+        if self._buffered >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        # one part file per partition with buffered rows
+        for keyword in list(self._buffers):
+            self._write_part(keyword, self._buffers.pop(keyword))
+        self._buffered = 0
+
+    def _write_part(self, keyword, rows):
+        batch = pa.record_batch([
+            [self.run_id] * len(rows),
+            [self.started_at] * len(rows),
+            [r.get("video_key") for r in rows],
+            [(r.get("keyword") or "").split(",") for r in rows],
+            [r.get("title") for r in rows],
+            [r.get("channel_title") for r in rows],
+            [r.get("channel_subs") for r in rows],
+            [r.get("views") for r in rows],
+            [r.get("likes") for r in rows],
+            [r.get("comments") for r in rows],
+            [r.get("duration_seconds") for r in rows],
+            [r.get("thumbnail") for r in rows],
+            [parse_published(r.get("published_at")) for r in rows],
+            [r.get("virality") for r in rows],
+            [r.get("monetization_likelihood") for r in rows],
+        ], schema=self.schema)
+        # keywords go into a path segment; hive partitioning URI-decodes it back on read
+        folder = os.path.join(self.directory, f"run_date={self.started_at.date().isoformat()}",
+                              f"keyword={quote(keyword, safe='') or '_'}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"part-{self.run_id}-{len(self.files)}.{self.fmt}")
+        if self.fmt == "parquet":
+            pq.write_table(pa.Table.from_batches([batch]), path, compression=EXPORT_COMPRESSION)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION)
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, self.schema, options=options) as writer:
+                writer.write_batch(batch)
+        self.files.append(path)
+
+    def close(self):
+        self.flush()
+        return self.files
+
+def open_dataset(directory=EXPORT_DIR, fmt="parquet"):
+    # every exported run under `directory` as one pyarrow dataset; run_date and keyword
+    # come from the partition paths, so filters on them skip whole directories
+    import pyarrow.dataset as ds
+    partitioning = ds.partitioning(pa.schema([("run_date", pa.date32()), ("keyword", pa.string())]), flavor="hive")
+    return ds.dataset(directory, format="ipc" if fmt == "arrow" else fmt, partitioning=partitioning)
@@ -0,0 +1,243 @@
+# viralscope/fakeapi.py
+"""Local stand-in for the YouTube Data API search, videos and channels endpoints.
+
+Payloads are synthetic but shaped like the real ones (nested snippets, counters as
+strings, ISO 8601 durations, thumbnails, tags, long descriptions) and are derived
+from the video index, so the same settings always serve the same data. Every
+keyword searched gets its own block of videos, ordered by views like the real
+search, so keywords x results per keyword are distinct videos; publishedAfter
+narrows a block to the videos published since, as incremental scans expect.
+
+    python -m viralscope fake-api --videos 10000 --latency-ms 50
+    YOUTUBE_API_BASE=http://127.0.0.1:8765 python -m viralscope scan -k anything
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import hashlib
+import json
+import math
+import multiprocessing
+import random
+import threading
+import time
+
+from .api import MAX_RESULTS_PER_KEYWORD, SEARCH_PAGE_SIZE
+
+DEFAULT_PORT = 8765
+DEFAULT_VIDEOS_PER_CHANNEL = 10
+DEFAULT_DESCRIPTION_WORDS = 120  # real descriptions run from a line to a few KB
+
+WORDS = (
+    "story", "reddit", "update", "cheating", "wedding", "family", "drama", "revenge", "secret", "sister",
+    "husband", "wife", "boss", "office", "neighbor", "money", "lawyer", "court", "party", "birthday",
+    "mother", "father", "roommate", "landlord", "karma", "entitled", "aita", "final", "part", "reaction",
+    "shocking", "truth", "caught", "lies", "friend", "betrayal", "inheritance", "holiday", "divorce", "twist",
+)
+COUNTRIES = ("US", "GB", "CA", "AU", "IN", "DE", None)
+
+def iso_duration(seconds):
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return "PT" + (f"{h}H" if h else "") + (f"{m}M" if m else "") + (f"{s}S" if s or not (h or m) else "")
+
+def thumbnails(url_id, sizes=("default", "medium", "high", "standard", "maxres")):
+    dims = {"default": (120, 90), "medium": (320, 180), "high": (480, 360), "standard": (640, 480), "maxres": (1280, 720)}
+    return {size: {"url": f"https://i.ytimg.com/vi/{url_id}/{size}.jpg", "width": dims[size][0], "height": dims[size][1]}
+            for size in sizes}
+
+class FakeYouTube:
+    """The synthetic dataset; thread-safe, everything but the keyword blocks is computed on demand."""
+
+    def __init__(self, n_videos=1000, videos_per_channel=DEFAULT_VIDEOS_PER_CHANNEL, latency_ms=0, now=None, days=7,
+                 description_words=DEFAULT_DESCRIPTION_WORDS):
+        self.n_videos = max(1, n_videos)
+        self.n_channels = max(1, math.ceil(self.n_videos / max(1, videos_per_channel)))
+        self.latency = latency_ms / 1000
+        self.now = (now or datetime.utcnow()).replace(microsecond=0)
+        self.window_seconds = max(1, days) * 86400
+        self.description_words = description_words
+        self.block_size = min(self.n_videos, MAX_RESULTS_PER_KEYWORD)
+        self._lock = threading.Lock()
+        self._blocks = {}  # keyword -> video indices, most viewed first
+        self._since = {}  # (keyword, publishedAfter) -> the block's videos published since
+
+    def video_id(self, i):
+        return f"fv{i:09d}"
+
+    def channel_id(self, c):
+        return f"UCfake{c:018d}"
+
+    def keyword_block(self, q):
+        with self._lock:
+            block = self._blocks.get(q)
+            if block is None:
+                start = len(self._blocks) * self.block_size
+                block = sorted(((start + j) % self.n_videos for j in range(self.block_size)), key=self.views, reverse=True)
+                self._blocks[q] = block
+        return block
+
+    def since(self, q, published_after):
+        if not published_after:
+            return self.keyword_block(q)
+        key = (q, published_after)
+        with self._lock:
+            block = self._since.get(key)
+        if block is None:
+            after = datetime.fromisoformat(published_after.rstrip("Z"))
+            block = [i for i in self.keyword_block(q) if self.published(i) >= after]
+            with self._lock:
+                self._since[key] = block
+        return block
+
+    def published(self, i):
+        # seeded apart from the rest of the video, so search can filter without building snippets
+        return self.now - timedelta(seconds=random.Random(f"published {i}").randrange(self.window_seconds))
+
+    def views(self, i):
+        return int(random.Random(i).lognormvariate(8, 2.5))
+
+    def text(self, rnd, n_words):
+        return " ".join(rnd.choice(WORDS) for _ in range(n_words))
+
+    def video_snippet(self, i, rnd):
+        c = i % self.n_channels
+        title = self.text(rnd, rnd.randint(5, 12)).title()
+        return {
+            "publishedAt": self.published(i).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "channelId": self.channel_id(c),
+            "title": title,
+            "description": self.text(rnd, self.description_words),
+            "thumbnails": thumbnails(self.video_id(i)),
+            "channelTitle": f"Channel {c}",
+            "liveBroadcastContent": "none",
+        }
+
+    def search_item(self, i):
+        snippet = self.video_snippet(i, random.Random(i))
+        snippet["description"] = snippet["description"][:160]
+        snippet["thumbnails"] = thumbnails(self.video_id(i), ("default", "medium", "high"))
+        snippet["publishTime"] = snippet["publishedAt"]
+        return {"kind": "youtube#searchResult", "etag": f"s{i}", "id": {"kind": "youtube#video", "videoId": self.video_id(i)},
+                "snippet": snippet}
+
+    def video_item(self, i):
+        rnd = random.Random(i)
+        snippet = self.video_snippet(i, rnd)
+        snippet["tags"] = [rnd.choice(WORDS) for _ in range(rnd.randint(0, 15))]
+        snippet["categoryId"] = "24"
+        snippet["localized"] = {"title": snippet["title"], "description": snippet["description"]}
+        views = self.views(i)
+        seconds = rnd.randint(10, 59) if rnd.random() < 0.3 else rnd.randint(60, 2400)
+        return {
+            "kind": "youtube#video",
+            "etag": f"v{i}",
+            "id": self.video_id(i),
+            "snippet": snippet,
+            "contentDetails": {"duration": iso_duration(seconds), "dimension": "2d", "definition": "hd", "caption": "false",
+                               "licensedContent": True, "contentRating": {}, "projection": "rectangular"},
+            "statistics": {"viewCount": str(views), "likeCount": str(views // rnd.randint(15, 60)), "favoriteCount": "0",
+                           "commentCount": str(views // rnd.randint(200, 2000))},
+        }
+
+    def channel_item(self, c):
+        rnd = random.Random(-1 - c)
+        subs = int(rnd.lognormvariate(8, 2))
+        statistics = {"viewCount": str(subs * rnd.randint(20, 400)), "subscriberCount": str(subs),
+                      "hiddenSubscriberCount": False, "videoCount": str(rnd.randint(5, 900))}
+        if rnd.random() < 0.05:
+            del statistics["subscriberCount"]
+            statistics["hiddenSubscriberCount"] = True
+        snippet = {
+            "title": f"Channel {c}",
+            "description": self.text(rnd, 40),
+            "customUrl": f"@channel{c}",
+            "publishedAt": (self.now - timedelta(days=rnd.randint(7, 3650))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "thumbnails": thumbnails(self.channel_id(c), ("default", "medium", "high")),
+        }
+        country = rnd.choice(COUNTRIES)
+        if country:
+            snippet["country"] = country
+        return {"kind": "youtube#channel", "etag": f"c{c}", "id": self.channel_id(c), "snippet": snippet,
+                "statistics": statistics}
+
+    def search(self, params):
+        block = self.since(params.get("q", ""), params.get("publishedAfter"))
+        offset = int(params.get("pageToken") or 0)
+        size = max(1, min(int(params.get("maxResults") or 5), SEARCH_PAGE_SIZE))
+        page = block[offset:offset + size]
+        body = {"kind": "youtube#searchListResponse", "regionCode": "US",
+                "pageInfo": {"totalResults": len(block), "resultsPerPage": size},
+                "items": [self.search_item(i) for i in page]}
+        if offset + size < len(block):
+            body["nextPageToken"] = str(offset + size)
+        return body
+
+    def videos(self, params):
+        ids = [v for v in params.get("id", "").split(",") if v.startswith("fv") and v[2:].isdigit()]
+        items = [self.video_item(int(v[2:])) for v in ids if int(v[2:]) < self.n_videos]
+        return {"kind": "youtube#videoListResponse", "items": items, "pageInfo": {"totalResults": len(items), "resultsPerPage": len(items)}}
+
+    def channels(self, params):
+        ids = [c for c in params.get("id", "").split(",") if c.startswith("UCfake") and c[6:].isdigit()]
+        items = [self.channel_item(int(c[6:])) for c in ids if int(c[6:]) < self.n_channels]
+        return {"kind": "youtube#channelListResponse", "items": items, "pageInfo": {"totalResults": len(items), "resultsPerPage": len(items)}}
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API, so the client's pool is exercised
+
+    def do_GET(self):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        endpoint = {"search": fake.search, "videos": fake.videos, "channels": fake.channels}.get(url.path.rstrip("/").rsplit("/", 1)[-1])
+        if fake.latency:
+            time.sleep(fake.latency)
+        if not endpoint:
+            return self.reply(404, {"error": {"code": 404, "message": "Not found", "errors": [{"reason": "notFound"}]}})
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = json.dumps(endpoint(params)).encode()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self.reply(304, None, etag)
+        self.reply(200, body, etag)
+
+    def reply(self, status, body, etag=None):
+        if isinstance(body, dict):
+            body = json.dumps(body).encode()
+        body = body or b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(fake, port=DEFAULT_PORT, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), FakeYouTubeHandler)
+    server.daemon_threads = True
+    server.fake = fake
+    return server
+
+def serve(port=DEFAULT_PORT, ready=None, **settings):
+    server = make_server(FakeYouTube(**settings), port)
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+@contextmanager
+def running_server(**settings):
+    # the server gets its own process so generating payloads does not compete with the
+    # scan for the GIL; yields the base URL to pass to api.set_api_base
+    ready = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=serve, kwargs=dict(settings, port=0, ready=ready), daemon=True)
+    proc.start()
+    try:
+        yield f"http://127.0.0.1:{ready.get(timeout=30)}"
+    finally:
+        proc.terminate()
+        proc.join()
@@ -0,0 +1,206 @@
+# viralscope/jobs.py
+"""Background scans: a job queue stored in SQLite, worker threads that drain it, and
+per-keyword checkpoints so a job whose worker died resumes where it stopped."""
+from dataclasses import asdict
+from datetime import datetime, timedelta
+import json
+import os
+import socket
+import threading
+import uuid
+
+from . import db
+from .api import API_KEYS
+from .engine import ScanConfig, run_scan
+from .export import CSV_COLUMNS
+
+HEARTBEAT_SECONDS = 5
+STALE_JOB_SECONDS = 60  # a running job without a heartbeat for this long is picked up again
+MAX_JOB_ATTEMPTS = 3
+POLL_SECONDS = 2
+ACTIVE_STATUSES = ("queued", "running")
+
+_job_api_keys = {}  # job_id -> API keys given at submit time; memory only, never written to the DB
+
+# -------------------------
+# Queue
+# -------------------------
+def submit_job(config):
+    db.ensure_db()
+    job_id = uuid.uuid4().hex
+    payload = {k: v for k, v in asdict(config).items() if k != "api_keys"}
+    if list(config.api_keys) != list(API_KEYS):
+        _job_api_keys[job_id] = list(config.api_keys)
+    conn = db.connect()
+    with conn:
+        conn.execute("INSERT INTO scan_jobs(job_id, status, config, created_at) VALUES (?, 'queued', ?, ?)",
+                     (job_id, json.dumps(payload), datetime.utcnow().isoformat()))
+    conn.close()
+    return job_id
+
+JOB_COLUMNS = ("job_id", "status", "created_at", "started_at", "finished_at", "attempts",
+               "progress_done", "progress_total", "progress_label", "error")
+
+def load_job(job_id):
+    conn = db.connect()
+    row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM scan_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    conn.close()
+    return dict(zip(JOB_COLUMNS, row)) if row else None
+
+def list_jobs(limit=20):
+    conn = db.connect()
+    rows = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM scan_jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+    conn.close()
+    return [dict(zip(JOB_COLUMNS, row)) for row in rows]
+
+def load_job_result(job_id):
+    # the result_payload of a finished job, or None
+    conn = db.connect()
+    row = conn.execute("SELECT result FROM scan_jobs WHERE job_id = ? AND status = 'done'", (job_id,)).fetchone()
+    conn.close()
+    return json.loads(row[0]) if row and row[0] else None
+
+def claim_next_job(worker):
+    # oldest queued job, or a running one whose worker stopped heartbeating; BEGIN IMMEDIATE
+    # takes the write lock first so two workers cannot claim the same job
+    now = datetime.utcnow()
+    stale = (now - timedelta(seconds=STALE_JOB_SECONDS)).isoformat()
+    conn = db.connect()
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("""
+            UPDATE scan_jobs SET status = 'failed', finished_at = ?, error = 'worker stopped too many times'
+            WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?
+        """, (now.isoformat(), stale, MAX_JOB_ATTEMPTS))
+        # as in _finish_job, checkpoints (raw video ids) go with the job
+        conn.execute("""
+            DELETE FROM scan_job_keywords
+            WHERE job_id IN (SELECT job_id FROM scan_jobs WHERE status IN ('done', 'failed'))
+        """)
+        row = conn.execute("""
+            SELECT job_id, config, started_at FROM scan_jobs
+            WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?)
+            ORDER BY created_at LIMIT 1
+        """, (stale,)).fetchone()
+        if row:
+            conn.execute("""
+                UPDATE scan_jobs SET status = 'running', worker = ?, heartbeat_at = ?,
+                    started_at = COALESCE(started_at, ?), attempts = attempts + 1
+                WHERE job_id = ?
+            """, (worker, now.isoformat(), now.isoformat(), row[0]))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {"job_id": row[0], "config": json.loads(row[1]), "started_at": datetime.fromisoformat(row[2] or now.isoformat())}
+
+def _update_job(job_id, **values):
+    values.setdefault("heartbeat_at", datetime.utcnow().isoformat())
+    conn = db.connect()
+    with conn:
+        conn.execute(f"UPDATE scan_jobs SET {', '.join(f'{k} = ?' for k in values)} WHERE job_id = ?",
+                     (*values.values(), job_id))
+    conn.close()
+
+def _finish_job(job_id, status, result=None, error=None):
+    conn = db.connect()
+    # checkpoints hold raw API items (video ids included), so they go with the job
+    with conn:
+        conn.execute("UPDATE scan_jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE job_id = ?",
+                     (status, datetime.utcnow().isoformat(), json.dumps(result, default=str) if result else None, error, job_id))
+        conn.execute("DELETE FROM scan_job_keywords WHERE job_id = ?", (job_id,))
+    conn.close()
+
+# -------------------------
+# Checkpoints
+# -------------------------
+def save_checkpoint(job_id, search_result, video_items):
+    conn = db.connect()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO scan_job_keywords(job_id, keyword, checkpoint, finished_at) VALUES (?,?,?,?)",
+                     (job_id, search_result["keyword"], json.dumps({"search": search_result, "videos": video_items}),
+                      datetime.utcnow().isoformat()))
+    conn.close()
+
+def load_checkpoints(job_id):
+    conn = db.connect()
+    rows = conn.execute("SELECT keyword, checkpoint FROM scan_job_keywords WHERE job_id = ?", (job_id,)).fetchall()
+    conn.close()
+    return {kw: json.loads(cp) for kw, cp in rows}
+
+# -------------------------
+# Worker
+# -------------------------
+def result_payload(result):
+    # JSON-safe ScanResult for the job row; sample urls carry the video id, so they are dropped
+    cards = [dict(c, sample_videos=[{k: v for k, v in sv.items() if k != "url"} for sv in c["sample_videos"]])
+             for c in result.channel_cards]
+    return {
+        "started_at": result.started_at.isoformat(),
+        "keywords": result.keywords,
+        "channel_cards": cards,
+        "csv_rows": [row.as_dict(CSV_COLUMNS) for row in result.csv_rows],
+        "errors": result.errors,
+        "notices": result.notices,
+        "stats": result.stats,
+        "run_id": result.run_id,
+        "csv_file": result.csv_file,
+        "export_files": result.export_files,
+        "metrics": result.metrics,
+    }
+
+def run_job(job):
+    job_id = job["job_id"]
+    stop = threading.Event()
+
+    def heartbeat():
+        # a keyword can page for minutes without reporting progress
+        while not stop.wait(HEARTBEAT_SECONDS):
+            _update_job(job_id)
+
+    def on_progress(done, total, label):
+        _update_job(job_id, progress_done=done, progress_total=total, progress_label=label)
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        # a config this worker cannot run (e.g. an export format whose library is missing)
+        # fails the job, not the worker
+        config = ScanConfig(**job["config"], api_keys=_job_api_keys.get(job_id, list(API_KEYS)))
+        # the original start time keeps the search window and watermarks of a resumed job unchanged
+        result = run_scan(config, on_progress=on_progress, now=job["started_at"], resume=load_checkpoints(job_id),
+                          on_keyword_done=lambda search, videos: save_checkpoint(job_id, search, videos))
+    except Exception as err:
+        _finish_job(job_id, "failed", error=str(err))
+    else:
+        _finish_job(job_id, "done", result=result_payload(result))
+    finally:
+        stop.set()
+        beat.join()
+        _job_api_keys.pop(job_id, None)
+
+def work(stop_event=None, once=False, poll_seconds=POLL_SECONDS, worker=None):
+    # run queued jobs until stop_event is set (or, with once, until the queue is empty)
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    stop_event = stop_event or threading.Event()
+    db.ensure_db()
+    while not stop_event.is_set():
+        job = claim_next_job(worker)
+        if job:
+            run_job(job)
+        elif once:
+            return
+        else:
+            stop_event.wait(poll_seconds)
+
+def start_workers(count=2, poll_seconds=POLL_SECONDS):
+    # daemon threads for an embedding process (the Streamlit app); returns the stop event
+    stop_event = threading.Event()
+    for _ in range(max(1, count)):
+        threading.Thread(target=work, kwargs={"stop_event": stop_event, "poll_seconds": poll_seconds}, daemon=True).start()
+    return stop_event
@@ -0,0 +1,97 @@
+# viralscope/metrics.py
+"""Scan profiling: wall time and row counts per pipeline stage, API counters per
+endpoint, and an opt-in JSON-lines log for comparing runs across versions."""
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+
+class StageTimer:
+    """Thread-safe per-stage wall time and row counts; a stage entered twice adds up.
+
+    With trace_memory (tracemalloc must be running) each stage also records the peak
+    memory it allocated on top of what was live when it started; stages must then
+    not overlap, which holds for the scan pipeline."""
+
+    def __init__(self, trace_memory=False):
+        self._lock = threading.Lock()
+        self.trace_memory = trace_memory
+        self.peak_bytes = 0  # highest traced total seen during any stage
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            live = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peak_bytes = max(self.peak_bytes, peak)
+                peak -= live
+            self.add(name, seconds=seconds, peak_bytes=peak)
+
+    def add(self, name, seconds=0.0, rows=0, peak_bytes=None):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "rows": 0})
+            entry["seconds"] += seconds
+            entry["rows"] += rows
+            if peak_bytes is not None:
+                entry["peak_bytes"] = max(entry.get("peak_bytes", 0), peak_bytes)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(v, seconds=round(v["seconds"], 4)) for name, v in self.stages.items()}
+
+def merge_endpoint_stats(snapshots):
+    # YouTubeClient.endpoint_stats() from several clients (crawler shards + coordinator)
+    merged = {}
+    for snap in snapshots:
+        for endpoint, counters in snap.items():
+            entry = merged.setdefault(endpoint, {})
+            for name, value in counters.items():
+                entry[name] = entry.get(name, 0) + value
+    return merged
+
+def build_profile(timer, endpoints, wall_seconds):
+    # the metrics stored with a run: {"wall_seconds", "stages", "api", "api_totals"}
+    totals = {}
+    for counters in endpoints.values():
+        for name, value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+    return {
+        "wall_seconds": round(wall_seconds, 4),
+        "stages": timer.snapshot(),
+        "api": {endpoint: dict(counters, seconds=round(counters.get("seconds", 0), 4)) for endpoint, counters in endpoints.items()},
+        "api_totals": {name: round(value, 4) if isinstance(value, float) else value for name, value in totals.items()},
+    }
+
+_revision = []
+
+def code_revision():
+    # git revision of the running code, so logged runs can be compared across versions
+    if not _revision:
+        try:
+            out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                 capture_output=True, text=True, timeout=5)
+            _revision.append(out.stdout.strip() or None)
+        except (OSError, subprocess.SubprocessError):
+            _revision.append(None)
+    return _revision[0]
+
+def append_metrics_log(path, record):
+    from . import __version__
+    line = dict(record, logged_at=datetime.utcnow().isoformat(), version=__version__, revision=code_revision(),
+                python=platform.python_version())
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(line, default=str) + "\n")
@@ -0,0 +1,140 @@
+# viralscope/scoring.py
+"""Vectorized (pandas/NumPy) versions of the scalar parsers and scores in utils.
+
+Every function here must return exactly what the scalar function returns for the
+same input. The common case is vectorized; inputs the fast path cannot prove it
+handles identically (odd durations, unusual timestamps, non-digit counters) fall
+back to the scalar function row by row.
+"""
+import numpy as np
+import pandas as pd
+
+from .utils import (
+    compute_virality_score, parse_iso8601_duration_to_seconds, parse_rfc3339_to_datetime, safe_int,
+)
+
+BATCH_SCORING_MIN_ROWS = 1000  # below this the frame setup costs more than the Python loop
+
+_STRICT_DURATION = r"^PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$"
+_PLAIN_INT = r"\s*[+-]?\d+\s*"
+
+def safe_int_series(values):
+    s = pd.Series(values, dtype=object)
+    out = np.zeros(len(s), dtype=np.int64)
+    as_str = s.astype(str)
+    plain = s.notna().to_numpy() & as_str.str.fullmatch(_PLAIN_INT).fillna(False).to_numpy(dtype=bool)
+    out[plain] = as_str[plain].str.strip().astype(np.int64).to_numpy()
+    other = s.notna().to_numpy() & ~plain
+    for i in np.flatnonzero(other):
+        out[i] = safe_int(s.iat[i])
+    return out
+
+def parse_durations(values):
+    s = pd.Series(values, dtype=object)
+    out = np.zeros(len(s), dtype=np.int64)
+    is_str = s.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    parts = s.where(is_str).str.extract(_STRICT_DURATION)
+    # bare "PT" matches the strict pattern with every group empty
+    strict = (is_str & parts.notna().any(axis=1).to_numpy()) | (s.where(is_str) == "PT").to_numpy(dtype=bool)
+    nums = parts.fillna("0").astype(np.int64).to_numpy()
+    seconds = nums[:, 0] * 3600 + nums[:, 1] * 60 + nums[:, 2]
+    out[strict] = seconds[strict]
+    # "PT1.5S" and friends take the scalar regex-findall path
+    loose = is_str & ~strict
+    for i in np.flatnonzero(loose):
+        out[i] = parse_iso8601_duration_to_seconds(s.iat[i])
+    return out
+
+def parse_timestamps(values):
+    s = pd.Series(values, dtype=object)
+    is_str = s.map(lambda v: isinstance(v, str) and v != "").to_numpy(dtype=bool)
+    cleaned = s.where(is_str).str.replace(r"Z$", "", regex=True).str.split(".", n=1).str[0]
+    parsed = pd.to_datetime(cleaned, format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+    missing = is_str & parsed.isna().to_numpy()
+    for i in np.flatnonzero(missing):
+        dt = parse_rfc3339_to_datetime(s.iat[i])
+        if dt is not None:
+            parsed.iat[i] = pd.Timestamp(dt)
+    return parsed
+
+def virality_scores(views, published, now):
+    views = np.asarray(views, dtype=np.int64)
+    published = pd.Series(published)
+    # whole microseconds then /1e6 mirrors timedelta.total_seconds() bit for bit
+    delta_us = ((pd.Timestamp(now) - published).to_numpy(dtype="timedelta64[us]")).astype(np.int64)
+    days = np.where(published.isna().to_numpy(), 1.0, np.maximum(1.0, (delta_us / 1e6) / (24 * 3600)))
+    vpd = views / days
+    score = np.log10(1 + vpd) * 30
+    out = np.trunc(np.clip(score, 0, 100)).astype(np.int64)
+    # libm and NumPy log10 may differ in the last ulp; recheck scores sitting on an integer
+    edge = np.flatnonzero(np.abs(score - np.round(score)) < 1e-9)
+    for i in edge:
+        dt = published.iat[i]
+        out[i] = compute_virality_score(int(views[i]), None if pd.isna(dt) else dt.to_pydatetime(), now=now)
+    return out
+
+def monetization_scores(subs, avg_views, age_months):
+    subs = np.nan_to_num(np.asarray(subs, dtype=float), nan=0.0)
+    v = np.nan_to_num(np.asarray(avg_views, dtype=float), nan=0.0)
+    age = np.nan_to_num(np.asarray(age_months, dtype=float), nan=0.0)
+    s = np.select([subs >= 10000, subs >= 5000, subs >= 1000, subs >= 500], [45, 30, 18, 8], 2)
+    s = s + np.select([v >= 50000, v >= 10000, v >= 2000, v >= 500], [28, 20, 12, 6], 1)
+    s = s + np.select([age >= 36, age >= 12, age >= 6], [18, 10, 5], 1)
+    return np.clip(s, 0, 100).astype(np.int64)
+
+def video_frame(video_items, now):
+    # one row per videos.list item with the parsed/scored columns merge_video_items needs
+    snippets = [vi.get("snippet", {}) for vi in video_items]
+    stats = [vi.get("statistics", {}) for vi in video_items]
+    published = parse_timestamps([sn.get("publishedAt") for sn in snippets])
+    views = safe_int_series([st.get("viewCount", 0) for st in stats])
+    df = pd.DataFrame({
+        "views": views,
+        "likes": safe_int_series([st.get("likeCount", 0) for st in stats]),
+        "comments": safe_int_series([st.get("commentCount", 0) for st in stats]),
+        "duration_seconds": parse_durations([vi.get("contentDetails", {}).get("duration", "PT0S") for vi in video_items]),
+        "virality": virality_scores(views, published, now),
+    })
+    iso = published.dt.strftime("%Y-%m-%dT%H:%M:%S").astype(object).where(published.notna(), None)
+    # explicit object dtype, otherwise newer pandas turns the None gaps into NaN
+    df["published_at"] = pd.Series(iso.tolist(), dtype=object, index=df.index)
+    return df
+
+def channel_aggregates(channel_map):
+    # per-channel sample stats exactly as build_channel_cards computes them by hand;
+    # median_virality is the upper middle element, like sorted(v)[n // 2]
+    cids, durations, views, virality = [], [], [], []
+    for cid, cinfo in channel_map.items():
+        for v in cinfo.get("sample_videos", []):
+            cids.append(cid)
+            durations.append(v["duration_seconds"])
+            views.append(v["views"])
+            virality.append(v["virality"])
+    if not cids:
+        return {}
+    df = pd.DataFrame({"cid": cids, "duration": np.asarray(durations, dtype=np.int64),
+                       "views": np.asarray(views, dtype=np.int64), "virality": np.asarray(virality, dtype=np.int64)})
+    g = df.groupby("cid", sort=False)
+    agg = pd.DataFrame({
+        "n": g.size(),
+        "duration_sum": g["duration"].sum(),
+        "views_sum": g["views"].sum(),
+        "highest": g["virality"].max(),
+    })
+    ordered = df.sort_values(["cid", "virality"], kind="stable")
+    pos = ordered.groupby("cid", sort=False).cumcount().to_numpy()
+    counts = agg["n"].reindex(ordered["cid"]).to_numpy()
+    agg["median"] = ordered.loc[pos == counts // 2].set_index("cid")["virality"]
+    n = agg["n"].to_numpy()
+    agg["avg_duration"] = agg["duration_sum"].to_numpy() / n
+    agg["avg_views"] = agg["views_sum"].to_numpy() / n
+    return {
+        cid: {
+            "sample_count": int(row.n),
+            "avg_duration": float(row.avg_duration),
+            "avg_views_sample": float(row.avg_views),
+            "highest_virality": int(row.highest),
+            "median_virality": int(row.median),
+        }
+        for cid, row in zip(agg.index, agg.itertuples(index=False))
+    }
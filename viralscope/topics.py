@@ -0,0 +1,96 @@
+# viralscope/topics.py
+"""Topic discovery: phrases (1-3 word n-grams of titles and tags) weighted by the
+virality of the videos that use them, counted once per run as it is saved.
+
+A phrase's share of a run is the virality its videos carry over the virality of
+all the run's videos. Rising topics compare the share over the last few runs with
+the share over every earlier run; db.py keeps the per-run counts and running totals,
+so neither side re-reads stored samples."""
+from functools import lru_cache
+import re
+
+MIN_RUN_VIDEOS = 2  # phrases fewer videos of a run use are not stored for it
+TOPIC_RECENT_RUNS = 3
+TOPIC_MIN_VIDEOS = 5  # over the recent runs, for a phrase to be suggested
+TOPIC_PRIOR_SHARE = 0.005  # smoothing, so a phrase seen once before is not an infinite rise
+TOPIC_SUGGESTIONS = 15
+
+WORD_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our she so
+    than that the their them then there they this to up was we were what when who why will with you your
+    vs via just get got do did how all out after before about over new video videos official full ep episode
+    s t ll ve re d m
+""".split())
+
+def phrases(text):
+    # every 1-3 word run of `text` that neither starts nor ends with a stopword or a number
+    words = WORD_RE.findall(text.lower())
+    keep = [w not in STOPWORDS and not w.isdigit() for w in words]
+    found = [w for w, k in zip(words, keep) if k]
+    found += [f"{a} {b}" for a, b, ka, kb in zip(words, words[1:], keep, keep[1:]) if ka and kb]
+    found += [f"{a} {b} {c}" for a, b, c, ka, kc in zip(words, words[1:], words[2:], keep, keep[2:]) if ka and kc]
+    return found
+
+@lru_cache(maxsize=1 << 16)
+def tag_phrases(tag):
+    # the same tags recur across a channel's videos
+    return tuple(phrases(tag))
+
+def video_phrases(title, tags):
+    # a video counts once per phrase; tags are separate phrases, never joined across
+    found = set(phrases(title or ""))
+    for tag in (tags or "").split(","):
+        found.update(tag_phrases(tag))
+    return found
+
+def count_run_phrases(rows):
+    # rows of (title, tags, virality) -> ({phrase: [weight, videos]}, total weight);
+    # a video weighs virality / 100, so unviral videos add nothing
+    weights, videos = {}, {}
+    total = 0.0
+    for title, tags, virality in rows:
+        weight = (virality or 0) / 100
+        if weight <= 0:
+            continue
+        total += weight
+        for phrase in video_phrases(title, tags):
+            if phrase in videos:
+                weights[phrase] += weight
+                videos[phrase] += 1
+            else:
+                weights[phrase] = weight
+                videos[phrase] = 1
+    return {phrase: (weights[phrase], n) for phrase, n in videos.items() if n >= MIN_RUN_VIDEOS}, total
+
+def rank_rising(recent, recent_weight, baseline_weight, limit=TOPIC_SUGGESTIONS, min_videos=TOPIC_MIN_VIDEOS):
+    # recent: (phrase, weight in recent runs, videos in recent runs, weight over all runs)
+    scored = []
+    for phrase, weight, videos, total in recent:
+        if videos < min_videos:
+            continue
+        recent_share = weight / recent_weight
+        baseline_share = max(0.0, total - weight) / baseline_weight
+        lift = (recent_share + TOPIC_PRIOR_SHARE) / (baseline_share + TOPIC_PRIOR_SHARE)
+        if lift > 1:
+            scored.append((lift, recent_share, phrase.count(" "), phrase, videos, baseline_share))
+    scored.sort(reverse=True)
+    picked = []
+    for lift, recent_share, _, phrase, videos, baseline_share in scored:
+        if any(overlaps(phrase, videos, other) for other in picked):
+            continue
+        picked.append({"phrase": phrase, "videos": videos, "recent_share": recent_share,
+                       "baseline_share": baseline_share, "lift": lift})
+        if len(picked) == limit:
+            break
+    return picked
+
+def overlaps(phrase, videos, picked):
+    # a phrase around or sharing words with a better ranked one is a variant of it unless it
+    # stands on its own: a shorter phrase inside it needs other videos, one sharing a word
+    # needs half its videos
+    if f" {phrase} " in f" {picked['phrase']} ":
+        return picked["videos"] >= 0.9 * videos
+    if f" {picked['phrase']} " in f" {phrase} ":
+        return True
+    return bool(set(phrase.split()) & set(picked["phrase"].split())) and videos < 0.5 * picked["videos"]
@@ -0,0 +1,108 @@
+# viralscope/utils.py
+"""Parsing and scoring helpers shared by the scan engine, CLI and UI."""
+from datetime import datetime
+import hashlib
+import re
+import math
+
+def parse_iso8601_duration_to_seconds(duration):
+    if not duration or not duration.startswith("PT"):
+        return 0
+    hours = minutes = seconds = 0
+    m = re.match(r"^PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$", duration)
+    if m:
+        h, mm, s = m.groups()
+        hours = int(h) if h else 0
+        minutes = int(mm) if mm else 0
+        seconds = int(s) if s else 0
+        return hours * 3600 + minutes * 60 + seconds
+    numbers = re.findall(r"(\d+\.?\d*)([HMS])", duration)
+    total = 0.0
+    for val, unit in numbers:
+        valf = float(val)
+        if unit == "H":
+            total += valf * 3600
+        elif unit == "M":
+            total += valf * 60
+        elif unit == "S":
+            total += valf
+    return int(total)
+
+def seconds_to_readable(seconds):
+    if seconds is None:
+        return "N/A"
+    s = int(seconds)
+    if s < 60:
+        return f"{s}s"
+    m, s = divmod(s, 60)
+    if m < 60:
+        return f"{m}m {s}s"
+    h, m = divmod(m, 60)
+    return f"{h}h {m}m"
+
+def safe_int(x):
+    try:
+        return int(x)
+    except:
+        return 0
+
+def parse_rfc3339_to_datetime(ts):
+    if not ts:
+        return None
+    if ts.endswith("Z"):
+        ts = ts[:-1]
+    if "." in ts:
+        ts = ts.split(".")[0]
+    try:
+        return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S")
+    except:
+        try:
+            return datetime.strptime(ts, "%Y-%m-%d")
+        except:
+            return None
+
+def compute_virality_score(views, published_at, now=None):
+    if not now:
+        now = datetime.utcnow()
+    if not published_at:
+        days = 1.0
+    else:
+        days = max(1.0, (now - published_at).total_seconds() / (24*3600))
+    vpd = views / days
+    score = math.log10(1 + vpd) * 30
+    return int(max(0, min(100, score)))
+
+def monetization_likelihood(subs, avg_views_per_video, channel_age_months):
+    s = 0.0
+    if subs is None:
+        subs = 0
+    if subs >= 10000: s += 45
+    elif subs >= 5000: s += 30
+    elif subs >= 1000: s += 18
+    elif subs >= 500: s += 8
+    else: s += 2
+    v = avg_views_per_video or 0
+    if v >= 50000: s += 28
+    elif v >= 10000: s += 20
+    elif v >= 2000: s += 12
+    elif v >= 500: s += 6
+    else: s += 1
+    age = channel_age_months or 0
+    if age >= 36: s += 18
+    elif age >= 12: s += 10
+    elif age >= 6: s += 5
+    else: s += 1
+    return int(max(0, min(100, s)))
+
+def chunked(seq, size):
+    for start in range(0, len(seq), size):
+        yield seq[start:start + size]
+
+def video_key(video_id=None, channel_id=None, title=None, published_at=None):
+    # one-way stand-in for a video id in storage; rows saved before keys existed
+    # only have (channel, title, published) to go on
+    if video_id:
+        raw = "id|" + video_id
+    else:
+        raw = "|".join(("sample", channel_id or "", title or "", published_at or ""))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
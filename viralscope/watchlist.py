@@ -0,0 +1,75 @@
+# viralscope/watchlist.py
+"""Channel watchlist: subscriber counts of chosen channels polled with channels.list
+alone (1 quota unit per 50 channels, where a search call costs 100), kept as a time
+series for subscriber growth and acceleration.
+
+    python -m viralscope watch add --top 2000
+    python -m viralscope watch refresh --every 60
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import math
+import time
+
+from . import db
+from .api import (
+    API_BATCH_SIZE, DEFAULT_DAILY_QUOTA, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_SCAN_CONCURRENCY, QuotaLedger, YouTubeClient,
+    make_http_session,
+)
+from .engine import fetch_by_ids
+from .utils import chunked
+
+WATCH_EVERY_MINUTES = 60
+
+def refresh_quota(n_channels):
+    return math.ceil(n_channels / API_BATCH_SIZE)
+
+def refresh_watchlist(api_keys=None, concurrency=DEFAULT_SCAN_CONCURRENCY, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                      daily_quota_budget=DEFAULT_DAILY_QUOTA, now=None):
+    # one channels.list call per 50 watched channels, within what is left of the day's
+    # budget; counters go to channel_stats and the profile to the channel cache, so scans
+    # that find these channels skip their lookup
+    db.ensure_db()
+    now = now or datetime.utcnow()
+    ids = db.load_watchlist_ids()
+    summary = {"channels": len(ids), "polled": 0, "missing": 0, "quota": 0, "errors": []}
+    if not ids:
+        return summary
+    ledger = QuotaLedger(budget=None if daily_quota_budget is None else max(0, daily_quota_budget - db.load_quota_spent_today(now)))
+    # cache off: a poll must see the current counts
+    client = YouTubeClient(make_http_session(concurrency), ledger, api_keys=api_keys,
+                           requests_per_second=requests_per_second, cache_mode="off")
+    items = []
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for batch_items, err in pool.map(lambda batch: fetch_by_ids(client, "channels", "snippet,statistics", batch),
+                                             chunked(ids, API_BATCH_SIZE)):
+                items.extend(batch_items)
+                if err:
+                    summary["errors"].append(err)
+    finally:
+        client.close()
+    # missing: deleted or terminated channels, and those of failed batches
+    summary.update(polled=len(items), missing=len(ids) - len(items), quota=ledger.total)
+    db.save_channel_stats(items, now, missing=summary["missing"], quota_units=ledger.total)
+    db.save_channels_to_cache(items, now)
+    return summary
+
+def subscriber_growth(series):
+    # series: load_subscriber_series(); the last count of each day, subscribers gained per
+    # day since the previous known day, and the change of that rate per day (acceleration).
+    # YouTube rounds public counts to three significant figures, so finer steps are noise
+    import pandas as pd
+    daily = series.set_index("at")["subs"].resample("D").last().dropna()
+    days = daily.index.to_series().diff().dt.days
+    growth = daily.diff() / days
+    return pd.DataFrame({"subs": daily, "growth_per_day": growth, "acceleration": growth.diff() / days})
+
+def run_refresher(every_minutes=WATCH_EVERY_MINUTES, on_refresh=None, **options):
+    # refresh now and then every `every_minutes`, until interrupted
+    while True:
+        started = time.monotonic()
+        summary = refresh_watchlist(**options)
+        if on_refresh:
+            on_refresh(summary)
+        time.sleep(max(0.0, every_minutes * 60 - (time.monotonic() - started)))